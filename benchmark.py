@@ -0,0 +1,458 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import statistics
+import threading
+import subprocess
+from datetime import datetime
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from course_output import OUTPUT_FORMATS, open_output
+from snapshot_store import SNAPSHOT_STORE, SnapshotOutput
+from sensei import load_script
+
+# Tools timed by a benchmark run, the LLM ones talk to the mock LLM server
+BENCHMARK_TOOLS = ('grammar', 'titles', 'duplicates', 'search', 'titles-llm', 'questions', 'questions-chatgpt')
+LLM_TOOLS = ('titles-llm', 'questions', 'questions-chatgpt')
+
+# Stages the analysis tools report when profiled, see profiling.py
+STAGES = ('read', 'parse', 'extract', 'check', 'write')
+
+# Vocabulary for synthetic lessons, with some trademarks and banned terms for the linters to find
+WORDS = (
+    "the a of to and in is for with on as by this that from plugin theme block editor site page post "
+    "database query cache object transient hook filter action request response server client user "
+    "option meta field table index schema migration deploy release branch commit review test debug "
+    "profile memory performance latency error warning notice log report template function class method "
+    "wordpress mysql javascript php api rest cli sqlite vip devtools e-mail web site"
+).split()
+
+def random_sentence(rng, words, end='.'):
+    sentence = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return sentence[0].upper() + sentence[1:] + end
+
+def random_lesson_content(rng, headings, paragraphs, words):
+    """Build a lesson body with the given number of headings and paragraphs of roughly `words` words."""
+    # Spread the headings evenly between the paragraphs
+    heading_before = {number * paragraphs // headings for number in range(headings)} if headings else set()
+    html_content = ''
+    for paragraph in range(paragraphs):
+        if paragraph in heading_before:
+            level = rng.choice((2, 2, 3))
+            html_content += f'<h{level}>{random_sentence(rng, rng.randint(2, 6), end="")}</h{level}>'
+        if rng.random() < 0.2:
+            items = ''.join(f'<li>{random_sentence(rng, rng.randint(3, 10), end=rng.choice((".", "")))}</li>' for _ in range(rng.randint(2, 5)))
+            html_content += f'<ul>{items}</ul>'
+        else:
+            sentences = []
+            remaining = words
+            while remaining > 0:
+                length = min(remaining, rng.randint(6, 40))
+                sentences.append(random_sentence(rng, length, end=rng.choice(('.', '.', '.', '?', ''))))
+                remaining -= length
+            html_content += f'<p>{" ".join(sentences)}</p>'
+    return html_content
+
+def generate_course(folder_title, lessons=100, modules=10, headings=5, paragraphs=10, words=60,
+                    duplicates=0.1, output_format='dir', seed=1):
+    """Generate a synthetic course with the scraper's own save functions and return its lesson source.
+
+    A `duplicates` share of the lessons are near-copies of an earlier lesson,
+    so the near-duplicate reuse paths get exercised too.
+    """
+    scraper = load_script('course-scraper-2.py')
+    # The scraper logs every file it saves
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(seed)
+    module_names = [f"Module {number + 1}: {random_sentence(rng, 3, end='')}" for number in range(modules)]
+
+    links = []
+    rest_lessons = {}
+    for number in range(lessons):
+        link = f"https://example.test/lesson/lesson-{number + 1}/"
+        module_name = module_names[number * modules // lessons]
+        lesson_title = random_sentence(rng, rng.randint(3, 7), end='')
+        if links and rng.random() < duplicates:
+            _, _, content = rest_lessons[rng.choice(links)]
+            content = content.replace('</p>', f' {rng.choice(WORDS)}</p>', 1)
+        else:
+            content = random_lesson_content(rng, headings, paragraphs, words)
+        links.append(link)
+        rest_lessons[link] = (lesson_title, module_name, content)
+
+    if output_format == 'snapshot':
+        output = SnapshotOutput(os.path.basename(folder_title), os.path.join(os.path.dirname(folder_title), SNAPSHOT_STORE))
+    else:
+        output = open_output(folder_title, output_format)
+    try:
+        modules_content, lesson_paths = scraper.process_lessons(None, links, None, output, rest_lessons)
+        scraper.save_course(modules_content, lesson_paths, "Benchmark Course", "https://example.test/course/", output)
+    finally:
+        output.close()
+
+    if output_format == 'dir':
+        return os.path.join(folder_title, 'lessons')
+    if output_format == 'snapshot':
+        return output.path
+    return folder_title + '.' + output_format
+
+def mock_questions(prompt):
+    """Build three well-formed questions from the words of a prompt."""
+    topics = re.findall(r'[A-Za-z]{6,}', prompt.split('\n\n', 1)[-1])[:30] or ['lessons']
+    questions = []
+    for number in range(3):
+        topic = topics[number * len(topics) // 3]
+        questions.append({
+            "question": f"Which statement about {topic} is correct?",
+            "options": [
+                {"text": f"{topic} is covered in this lesson", "correct": True},
+                {"text": f"{topic} is deprecated", "correct": False},
+                {"text": f"{topic} only applies to multisite", "correct": False},
+                {"text": f"{topic} is configured in wp-config.php", "correct": False},
+            ],
+            "answer_explanation": f"The lesson explains {topic}.",
+        })
+    return json.dumps({"questions": questions})
+
+def mock_answer(prompt):
+    """Answer a title case prompt with the title cased text, anything else with questions."""
+    title = re.search(r'maintaining context:\n\n(.*)\n\nReturn only', prompt, re.DOTALL)
+    if title:
+        return title.group(1).title()
+    return mock_questions(prompt)
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Answer Ollama (/api/chat, /api/generate) and OpenAI (/v1/chat/completions) requests.
+
+    Waits `latency` seconds before the first token, then streams the rest at
+    `token_rate` tokens a second, with words standing in for tokens.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/mock/ollama-run':
+            self.respond_ollama_cli({key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()})
+            return
+        request = json.loads(body or b'{}')
+        if self.path == '/api/chat':
+            prompt = request["messages"][-1]["content"]
+            self.respond_ollama(request, prompt, lambda text: {"message": {"role": "assistant", "content": text}})
+        elif self.path == '/api/generate':
+            self.respond_ollama(request, request["prompt"], lambda text: {"response": text})
+        elif self.path == '/v1/chat/completions':
+            self.respond_openai(request, request["messages"][-1]["content"])
+        else:
+            self.send_error(404)
+
+    def stream_answer(self, prompt):
+        """Yield the answer in chunks, paced like a model generating it."""
+        time.sleep(self.server.latency)
+        words = re.findall(r'\S+\s*', mock_answer(prompt))
+        for start in range(0, len(words), 8):
+            chunk = words[start:start + 8]
+            if start:
+                time.sleep(len(chunk) / self.server.token_rate)
+            yield ''.join(chunk), len(chunk)
+
+    def send_stream_headers(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.end_headers()
+
+    def respond_ollama(self, request, prompt, body):
+        started = time.perf_counter()
+        stream = request.get("stream", True)
+        chunks = []
+        for text, tokens in self.stream_answer(prompt):
+            if stream:
+                if not chunks:
+                    self.send_stream_headers('application/x-ndjson')
+                self.write_json_line({"model": request["model"], "created_at": datetime.now().isoformat() + 'Z', **body(text), "done": False})
+            chunks.append((text, tokens))
+
+        # Streamed answers end with an empty chunk carrying the statistics, others come whole
+        final = {
+            "model": request["model"],
+            "created_at": datetime.now().isoformat() + 'Z',
+            **body('' if stream else ''.join(text for text, _ in chunks)),
+            "done": True,
+            "done_reason": "stop",
+            **self.ollama_stats(prompt, chunks, started),
+        }
+        if not stream:
+            self.send_stream_headers('application/json')
+        self.write_json_line(final)
+
+    def ollama_stats(self, prompt, chunks, started):
+        """The timing and token statistics Ollama ends an answer with."""
+        elapsed = int((time.perf_counter() - started) * 1e9)
+        return {
+            "total_duration": elapsed,
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_count": sum(tokens for _, tokens in chunks),
+            "eval_duration": elapsed - int(self.server.latency * 1e9),
+        }
+
+    def respond_ollama_cli(self, form):
+        """Answer the ollama CLI shim with its --verbose statistics, a blank line and the answer."""
+        started = time.perf_counter()
+        chunks = list(self.stream_answer(form["prompt"]))
+        stats = self.ollama_stats(form["prompt"], chunks, started)
+        lines = [
+            f"{name.replace('_', ' ')}: {value} token(s)" if name.endswith('count') else f"{name.replace('_', ' ')}: {value / 1e6:.3f}ms"
+            for name, value in stats.items()
+        ]
+        self.send_stream_headers('text/plain; charset=utf-8')
+        self.wfile.write(('\n'.join(lines) + '\n\n' + ''.join(text for text, _ in chunks)).encode('utf-8'))
+
+    def respond_openai(self, request, prompt):
+        self.send_stream_headers('text/event-stream')
+        chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": request["model"]}
+        completion_tokens = 0
+        for text, tokens in self.stream_answer(prompt):
+            completion_tokens += tokens
+            self.write_event({**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}]})
+        self.write_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+
+        if request.get("stream_options", {}).get("include_usage"):
+            prompt_tokens = sum(len(message["content"].split()) for message in request["messages"])
+            self.write_event({**chunk, "choices": [], "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }})
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def write_json_line(self, data):
+        self.wfile.write(json.dumps(data).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def write_event(self, data):
+        self.wfile.write(b'data: ' + json.dumps(data).encode('utf-8') + b'\n\n')
+        self.wfile.flush()
+
+def start_mock_llm_server(port=0, latency=0.2, token_rate=50.0):
+    """Start the mock LLM server in a background thread and return it."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_rate = token_rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Stands in for the ollama CLI: `ollama run [--verbose] <model> <prompt>` against OLLAMA_HOST,
+# printing the same --verbose statistics process-titles-with-ollama.py parses. It's a shell
+# script around curl, since starting a Python interpreter per call would dwarf the mock latency.
+OLLAMA_CLI_SHIM = """#!/bin/sh
+usage="mock ollama only supports: ollama run [--verbose] <model> <prompt>"
+[ "$1" = run ] || { echo "$usage" >&2; exit 1; }
+shift
+verbose=false
+if [ "$1" = --verbose ]; then verbose=true; shift; fi
+[ $# -eq 2 ] || { echo "$usage" >&2; exit 1; }
+response=$(curl -sS -f --data-urlencode "model=$1" --data-urlencode "prompt=$2" "$OLLAMA_HOST/mock/ollama-run") || exit 1
+# The statistics come first, then a blank line and the answer
+if [ "$verbose" = true ]; then printf '%s\\n' "${response%%
+
+*}" >&2; fi
+printf '%s\\n' "${response#*
+
+}"
+"""
+
+def install_ollama_shim(bin_folder):
+    """Write the mock ollama CLI into a folder that can be put first on PATH."""
+    if shutil.which('curl') is None:
+        raise RuntimeError("The mock ollama CLI needs curl on PATH")
+    os.makedirs(bin_folder, exist_ok=True)
+    path = os.path.join(bin_folder, 'ollama')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(OLLAMA_CLI_SHIM)
+    os.chmod(path, 0o755)
+
+def measure_shim_overhead(server, bin_folder, env, calls=10):
+    """Time the ollama CLI shim with the mock answering instantly, the cost each title-llm call adds on top of it."""
+    latency, token_rate = server.latency, server.token_rate
+    server.latency, server.token_rate = 0.0, float('inf')
+    seconds = []
+    try:
+        for _ in range(calls):
+            started = time.perf_counter()
+            subprocess.run([os.path.join(bin_folder, 'ollama'), 'run', '--verbose', 'mock', 'overhead'],
+                           env=env, check=True, capture_output=True)
+            seconds.append(time.perf_counter() - started)
+    finally:
+        server.latency, server.token_rate = latency, token_rate
+    return statistics.median(seconds)
+
+def tool_args(tool, source, run_folder):
+    if tool == 'search':
+        return [os.path.join(run_folder, 'search.db'), 'index', source]
+    return [source]
+
+def run_tool(tool, source, run_folder, env, profile=False):
+    """Run one tool end to end in a fresh process and return its timing and stage breakdown."""
+    env = dict(env)
+    profile_folder = os.path.join(run_folder, 'profile', tool)
+    if profile:
+        env['SENSEI_PROFILE_DIR'] = profile_folder
+
+    log_path = os.path.join(run_folder, 'logs', f"{tool}.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    sensei_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensei.py')
+    with open(log_path, 'w', encoding='utf-8') as log:
+        started = time.perf_counter()
+        returncode = subprocess.call([sys.executable, sensei_path, tool, *tool_args(tool, source, run_folder)],
+                                     cwd=run_folder, env=env, stdout=log, stderr=subprocess.STDOUT)
+        seconds = time.perf_counter() - started
+
+    with open(log_path, 'r', encoding='utf-8') as log:
+        output = log.read()
+    if returncode == 0:
+        status = 'ok'
+    elif 'ModuleNotFoundError' in output:
+        status = 'skipped (missing dependency)'
+    else:
+        status = f"failed (exit {returncode})"
+
+    result = {"tool": tool, "status": status, "seconds": round(seconds, 3), "log": log_path}
+    stages_path = os.path.join(profile_folder, 'stages.json')
+    if profile and os.path.exists(stages_path):
+        with open(stages_path, 'r', encoding='utf-8') as file:
+            result["stages"] = json.load(file)
+    return result
+
+def llm_call_count(report_path):
+    """Number of model calls (not cache hits) in an LLM report, 0 if the tool didn't write one."""
+    if not os.path.exists(report_path):
+        return 0
+    with open(report_path, 'r', encoding='utf-8') as file:
+        return json.load(file)["overall"]["calls"]
+
+def run_benchmark(args):
+    run_folder = os.path.abspath(os.path.join(args.output, datetime.now().strftime('%Y%m%d-%H%M%S')))
+    os.makedirs(run_folder)
+
+    started = time.perf_counter()
+    source = generate_course(os.path.join(run_folder, 'benchmark-course'), args.lessons, args.modules, args.headings,
+                             args.paragraphs, args.words, args.duplicates, args.output_format, args.seed)
+    print(f"Generated {args.lessons} lessons in {time.perf_counter() - started:.2f} s: {source}")
+
+    env = dict(os.environ)
+    server = None
+    shim_overhead = None
+    if any(tool in LLM_TOOLS for tool in args.tools):
+        server = start_mock_llm_server(latency=args.latency, token_rate=args.token_rate)
+        host = f"http://127.0.0.1:{server.server_address[1]}"
+        env.update({
+            'OLLAMA_HOST': host,
+            'OPENAI_BASE_URL': host + '/v1',
+            'OPENAI_API_KEY': 'mock',
+            'PATH': os.path.join(run_folder, 'bin') + os.pathsep + env.get('PATH', ''),
+        })
+        print(f"Mock LLM server on {host} ({args.latency * 1000:.0f} ms to first token, {args.token_rate:.0f} tokens/s)")
+        if 'titles-llm' in args.tools:
+            install_ollama_shim(os.path.join(run_folder, 'bin'))
+            shim_overhead = measure_shim_overhead(server, os.path.join(run_folder, 'bin'), env)
+            print(f"Mock ollama CLI overhead: {shim_overhead * 1000:.1f} ms per call")
+
+    results = []
+    print()
+    print(f"{'tool':<18} {'seconds':>9} {'lessons/s':>10}  status")
+    for tool in args.tools:
+        runs = [run_tool(tool, source, run_folder, env, args.profile) for _ in range(args.repeat)]
+        result = runs[-1]
+        result["runs"] = [run["seconds"] for run in runs]
+        result["seconds"] = round(statistics.median(result["runs"]), 3)
+        result["lessons_per_second"] = round(args.lessons / result["seconds"], 1) if result["seconds"] else None
+        if tool == 'titles-llm' and shim_overhead is not None:
+            # Each model call starts the mock CLI once, so report how much of the run that accounts for
+            result["shim_seconds"] = round(shim_overhead * llm_call_count(os.path.join(run_folder, 'titles_llm_report.json')), 3)
+        results.append(result)
+        print(f"{tool:<18} {result['seconds']:9.2f} {result['lessons_per_second'] or 0:10.1f}  {result['status']}"
+              + (f", {result['shim_seconds']:.2f}s of it starting the mock CLI" if "shim_seconds" in result else ""))
+        if "stages" in result:
+            print("    " + "  ".join(f"{stage} {result['stages'][stage]:.2f}s" for stage in STAGES if stage in result["stages"]))
+
+    if server:
+        server.shutdown()
+
+    results_path = os.path.join(run_folder, 'results.json')
+    with open(results_path, 'w', encoding='utf-8') as file:
+        json.dump({"config": vars(args), "source": source, "shim_overhead_seconds": shim_overhead, "results": results}, file, indent=2)
+    print(f"\nResults saved to {results_path}")
+    if args.profile:
+        print(f"Per-stage cProfile data saved under {os.path.join(run_folder, 'profile')}, "
+              f"view with `python -m pstats <file>.prof` or snakeviz")
+
+def add_course_arguments(parser):
+    parser.add_argument("--lessons", type=int, default=100, help="number of lessons (default 100)")
+    parser.add_argument("--modules", type=int, default=10, help="number of modules (default 10)")
+    parser.add_argument("--headings", type=int, default=5, help="headings per lesson (default 5)")
+    parser.add_argument("--paragraphs", type=int, default=10, help="paragraphs per lesson (default 10)")
+    parser.add_argument("--words", type=int, default=60, help="words per paragraph (default 60)")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of near-duplicate lessons (default 0.1)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="dir")
+    parser.add_argument("--seed", type=int, default=1)
+
+def add_mock_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.2, help="mock LLM seconds to first token (default 0.2)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="mock LLM tokens per second (default 50)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lesson analysis tools on a synthetic course.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate a course and time each tool end to end")
+    add_course_arguments(run_parser)
+    add_mock_arguments(run_parser)
+    run_parser.add_argument("--tools", nargs="+", choices=BENCHMARK_TOOLS, default=list(BENCHMARK_TOOLS))
+    run_parser.add_argument("--repeat", type=int, default=1, help="runs per tool, the median is reported (default 1)")
+    run_parser.add_argument("--profile", action="store_true",
+                            help="dump cProfile data per stage (read, parse, extract, check, write) for each tool")
+    run_parser.add_argument("--output", default="benchmarks", help="folder for benchmark runs (default benchmarks)")
+
+    generate_parser = commands.add_parser("generate", help="only generate a synthetic course")
+    generate_parser.add_argument("folder_title", help="course folder (or archive name without extension)")
+    add_course_arguments(generate_parser)
+
+    mock_parser = commands.add_parser("mock-llm", help="serve the mock Ollama/OpenAI API until interrupted")
+    mock_parser.add_argument("--port", type=int, default=11435)
+    add_mock_arguments(mock_parser)
+    args = parser.parse_args()
+
+    if args.command in ("run", "generate") and (args.lessons < 1 or args.modules < 1):
+        print("Error: --lessons and --modules must be at least 1.")
+        sys.exit(1)
+
+    if args.command == "run":
+        if args.repeat < 1:
+            print("Error: --repeat must be at least 1.")
+            sys.exit(1)
+        run_benchmark(args)
+    elif args.command == "generate":
+        source = generate_course(args.folder_title, args.lessons, args.modules, args.headings, args.paragraphs,
+                                 args.words, args.duplicates, args.output_format, args.seed)
+        print(f"Generated {args.lessons} lessons: {source}")
+    else:
+        server = start_mock_llm_server(args.port, args.latency, args.token_rate)
+        print(f"Mock LLM server on http://127.0.0.1:{args.port}")
+        print(f"  OLLAMA_HOST=http://127.0.0.1:{args.port} OPENAI_BASE_URL=http://127.0.0.1:{args.port}/v1")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
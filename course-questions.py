@@ -1,27 +1,23 @@
 import os
 import sys
 import json
+import time
 from bs4 import BeautifulSoup
-from typing import List
-from ollama import chat
-from pydantic import BaseModel
+from course_output import course_name, is_lesson_source, iter_lessons, module_for_lesson, module_map, output_path
+from ollama import ResponseError, chat
+from pydantic import ValidationError
+from question_store import question_schema, open_question_store, has_current_questions, save_questions, load_questions
+from lesson_similarity import canonical_lessons
+from profiling import stage
+from llm_metrics import call_with_retries, record_llm_call, write_report
 
-# Define the structure of the question schema
-class QuestionOption(BaseModel):
-    text: str
-    correct: bool
+MODEL = "llama3.2"
 
-class Question(BaseModel):
-    question: str
-    options: List[QuestionOption]
-    answer_explanation: str
+def should_retry(error):
+    """Retry when Ollama can't be reached or fails on its side, not when the request is wrong."""
+    return isinstance(error, ConnectionError) or isinstance(error, ResponseError) and error.status_code >= 500
 
-class QuestionSchema(BaseModel):
-    questions: List[Question]
-
-question_schema = QuestionSchema.model_json_schema()
-
-def generate_questions_from_content(content):
+def generate_questions_from_content(content, lesson=None):
     """Generate multiple choice questions using Ollama's chat API."""
     prompt = (
         f"Create three different multiple-choice questions based on the following content. "
@@ -29,86 +25,94 @@ def generate_questions_from_content(content):
         f"{content}"
     )
 
+    def ask_model():
+        # Stream the response so time to first token can be measured
+        started = time.perf_counter()
+        time_to_first_token = None
+        response_content = ""
+        metrics = {}
+        for chunk in chat(
+            model=MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            format=question_schema,
+            stream=True,
+        ):
+            if time_to_first_token is None and chunk.message.content:
+                time_to_first_token = time.perf_counter() - started
+            response_content += chunk.message.content
+            if chunk.done:
+                metrics = {
+                    "prompt_tokens": chunk.prompt_eval_count or 0,
+                    "completion_tokens": chunk.eval_count or 0,
+                }
+        metrics.update(time_to_first_token=time_to_first_token, latency=time.perf_counter() - started)
+        return response_content, metrics
+
     # try:
-    response = chat(
-        model="llama3.2",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        format=question_schema,
-    )
-    print(response)
-    response_content = response.message.content
+    response_content = call_with_retries(MODEL, lesson, ask_model, should_retry)
     questions_data = json.loads(response_content).get("questions", [])
     return questions_data
     # except Exception as e:
     #     print(f"Error generating questions: {e}")
     #     return None
 
-def format_question_to_markdown(question_data):
-    """Format the question and answers into markdown format."""
-    markdown = f"**Question:** {question_data['question']}\n\n"
-    markdown += "**Options:**\n"
-    for idx, option in enumerate(question_data['options'], 1):
-        markdown += f"- {chr(64 + idx)}. {option['text']}\n"
-
-    # Find the correct answer safely
-    try:
-        correct_idx = next(idx for idx, option in enumerate(question_data['options'], 1) if option['correct'])
-        correct_label = chr(64 + correct_idx)
-    except StopIteration:
-        correct_label = "N/A"  # No correct answer provided
-
-    markdown += f"\n**Correct Answer:** {correct_label}\n"
-    markdown += f"\n**Explanation:** {question_data.get('answer_explanation', 'No explanation provided.')}\n"
-    return markdown
-
-def process_files(lesson_folder_path, questions_folder_path):
-    """Process all files in the given folder and generate questions."""
-    if not os.path.exists(questions_folder_path):
-        os.makedirs(questions_folder_path)
-
-    for filename in os.listdir(lesson_folder_path):
-        if filename.endswith('.html'):
-            lesson_path = os.path.join(lesson_folder_path, filename)
-
-            with open(lesson_path, 'r', encoding='utf-8') as file:
-                soup = BeautifulSoup(file, 'html.parser')
-
-                # Extract the content of the lesson
-                content = soup.get_text(strip=True)
-
-                # Get the title of the lesson (assumes <h1> tag for title)
-                h1_tag = soup.find('h1')
-                lesson_title = h1_tag.get_text(strip=True) if h1_tag else filename
-
-                print(f"Processing lesson: {lesson_title}")
-
-                # Generate three distinct multiple choice questions based on the content
-                questions = generate_questions_from_content(content)
-                if questions:
-                    # Create a markdown file for this lesson
-                    markdown_filename = os.path.splitext(filename)[0] + '.md'
-                    markdown_path = os.path.join(questions_folder_path, markdown_filename)
-
-                    with open(markdown_path, 'w', encoding='utf-8') as md_file:
-                        md_file.write(f"# Questions for: {lesson_title}\n\n")
-                        for idx, question_data in enumerate(questions, 1):
-                            md_file.write(f"## Question {idx}\n\n")
-                            markdown_content = format_question_to_markdown(question_data)
-                            md_file.write(markdown_content)
-
-                     # Save the questions as a JSON file
-                    json_filename = os.path.splitext(filename)[0] + '.json'
-                    json_path = os.path.join(questions_folder_path, json_filename)
-
-                    with open(json_path, 'w', encoding='utf-8') as json_file:
-                        json.dump({"questions": questions}, json_file, indent=2)
-
-                    print(f"Questions saved to {markdown_filename} and {json_filename}")
+def process_files(lesson_folder_path, question_store_path):
+    """Process all files in the given folder and store generated questions."""
+    conn = open_question_store(question_store_path)
+
+    # Near-duplicate lessons reuse the questions of the first lesson in their cluster
+    canonical = canonical_lessons(lesson_folder_path)
+    modules = module_map(lesson_folder_path)
+    course = course_name(lesson_folder_path)
+
+    for filename, html_content in iter_lessons(lesson_folder_path):
+        with stage('parse'):
+            soup = BeautifulSoup(html_content, 'html.parser')
+
+        with stage('extract'):
+            # Extract the content of the lesson
+            content = soup.get_text(strip=True)
+
+            # Get the title of the lesson (assumes <h1> tag for title)
+            h1_tag = soup.find('h1')
+            lesson_title = h1_tag.get_text(strip=True) if h1_tag else filename
+
+        print(f"Processing lesson: {lesson_title}")
+
+        lesson_name = os.path.splitext(filename)[0]
+        module = module_for_lesson(filename, modules)
+
+        if has_current_questions(conn, course, lesson_name, MODEL, content):
+            print(f"Questions for {lesson_name} are up to date")
+            continue
+
+        if filename in canonical:
+            questions = load_questions(conn, course, os.path.splitext(canonical[filename])[0], MODEL)
+            if questions:
+                record_llm_call(MODEL, lesson_name, cache_hit=True)
+                with stage('write'):
+                    saved = save_questions(conn, course, lesson_name, lesson_title, module, MODEL, content, questions)
+                print(f"Reused {saved} questions from near-duplicate lesson {canonical[filename]}")
+                continue
+
+        # Generate three distinct multiple choice questions based on the content
+        with stage('check'):
+            questions = generate_questions_from_content(content, lesson_name)
+        if questions:
+            try:
+                with stage('write'):
+                    saved = save_questions(conn, course, lesson_name, lesson_title, module, MODEL, content, questions)
+            except ValidationError as e:
+                print(f"Skipping {lesson_name}, the generated questions don't match the schema: {e}")
+                continue
+            print(f"{saved} questions saved to {question_store_path}")
+
+    conn.close()
 
 def main():
     if len(sys.argv) != 2:
@@ -117,14 +121,15 @@ def main():
 
     lesson_folder_path = sys.argv[1]
 
-    if not os.path.isdir(lesson_folder_path):
-        print(f"Error: '{lesson_folder_path}' is not a valid directory.")
+    if not is_lesson_source(lesson_folder_path):
+        print(f"Error: '{lesson_folder_path}' is not a valid directory or scraper archive.")
         sys.exit(1)
 
-    # Define the questions directory
-    questions_folder_path = os.path.join(os.path.dirname(lesson_folder_path), 'questions')
+    # Define the question store, export with question_store.py
+    question_store_path = output_path(lesson_folder_path, 'questions.db')
 
-    process_files(lesson_folder_path, questions_folder_path)
+    process_files(lesson_folder_path, question_store_path)
+    write_report(output_path(lesson_folder_path, 'llm_report'))
     print("Question generation complete.")
 
 if __name__ == "__main__":
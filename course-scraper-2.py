@@ -1,10 +1,15 @@
-import os
 import sys
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import re
 import logging
+import argparse
+import html
+from concurrent.futures import ThreadPoolExecutor
+from course_html import lesson_html, module_html, all_modules_html
+from course_output import OUTPUT_FORMATS, open_output, write_manifest
+from proxy_pool import ProxyPool
 
 # Setup logging for verbose HTTP output
 logging.basicConfig(
@@ -28,14 +33,12 @@ def get_cookie_header():
         logging.error(str(e))
         sys.exit(1)
 
-def get_session_with_proxy():
-    """Create a session using a SOCKS5 proxy."""
-    session = requests.Session()
-    session.proxies = {
-        'http': 'socks5://localhost:8080',
-        'https': 'socks5://localhost:8080'
-    }
-    return session
+def get_session_with_proxy(proxy_urls=None, concurrency=1):
+    """Create a session that spreads requests over a pool of proxies.
+
+    Defaults to the single SOCKS5 proxy on localhost:8080.
+    """
+    return ProxyPool(proxy_urls, concurrency)
 
 def log_request_and_response(response):
     """Log detailed request and response information."""
@@ -60,6 +63,21 @@ def sanitize_filename(name):
     name = re.sub(r'[^a-z0-9\-]', '', name)
     return name
 
+# List of classes to remove
+CLASSES_TO_REMOVE = [
+    'wp-block-sensei-lms-lesson-actions',
+    'wp-block-sensei-lms-course-theme-prev-next-lesson',
+    'sensei-course-theme-lesson-actions', 
+    'sensei-course-theme-lesson-actions__complete-lesson-form',
+    'wp-block-group sensei-lesson-footer'
+]
+
+def remove_unwanted_elements(soup):
+    """Remove elements with the classes in CLASSES_TO_REMOVE."""
+    for class_name in CLASSES_TO_REMOVE:
+        for element in soup.find_all(class_=class_name):
+            element.decompose()  
+
 def download_and_process_content(session, url, cookie_header):
     headers = {'Cookie': cookie_header}
     response = session.get(url, headers=headers)
@@ -67,19 +85,7 @@ def download_and_process_content(session, url, cookie_header):
     response.raise_for_status()
     soup = BeautifulSoup(response.text, 'html.parser')
 
-    # List of classes to remove
-    classes_to_remove = [
-        'wp-block-sensei-lms-lesson-actions',
-        'wp-block-sensei-lms-course-theme-prev-next-lesson',
-        'sensei-course-theme-lesson-actions', 
-        'sensei-course-theme-lesson-actions__complete-lesson-form',
-        'wp-block-group sensei-lesson-footer'
-    ]
-
-    # Remove elements with the specified classes
-    for class_name in classes_to_remove:
-        for element in soup.find_all(class_=class_name):
-            element.decompose()  
+    remove_unwanted_elements(soup)
 
     # Get the page title
     page_title = soup.find('h1', class_='wp-block-post-title').get_text(strip=True)
@@ -96,54 +102,124 @@ def download_and_process_content(session, url, cookie_header):
 
     return page_title, module_name, main_content
 
-def save_lesson_html(module_number, lesson_number, module_name, lesson_title, content, lessons_folder):
+# WordPress REST API settings for the Sensei lesson post type and module taxonomy.
+# A taxonomy's terms route and its term field on posts share its rest_base.
+REST_PAGE_SIZE = 100
+REST_LESSONS_ENDPOINT = '/wp-json/wp/v2/lessons'
+REST_MODULE_BASE = 'modules'
+REST_MODULES_ENDPOINT = f'/wp-json/wp/v2/{REST_MODULE_BASE}'
+
+def get_rest_nonce(page_html):
+    """Find the REST API nonce WordPress prints for logged-in users.
+
+    Cookie authentication is only honoured by the REST API when the request
+    also carries this nonce in the X-WP-Nonce header.
+    """
+    match = (re.search(r'createNonceMiddleware\(\s*"([0-9a-f]+)"', page_html)
+             or re.search(r'"nonce"\s*:\s*"([0-9a-f]+)"', page_html))
+    return match.group(1) if match else None
+
+def get_rest_json(session, url, params, cookie_header, nonce):
+    """Fetch a REST API endpoint and return the decoded JSON."""
+    headers = {'Cookie': cookie_header}
+    if nonce:
+        headers['X-WP-Nonce'] = nonce
+    response = session.get(url, headers=headers, params=params)
+    log_request_and_response(response)
+    response.raise_for_status()
+    return response.json()
+
+def lesson_slug(link):
+    """Get a lesson's slug from its permalink."""
+    return urlparse(link).path.rstrip('/').split('/')[-1]
+
+def fetch_lessons_from_rest(session, url, links, cookie_header, nonce):
+    """Fetch lessons and their module names through the WordPress REST API.
+
+    Lessons are requested by slug, REST_PAGE_SIZE at a time. Returns a dict
+    of link -> (lesson_title, module_name, content) for every lesson found,
+    so missing lessons can fall back to the HTML scrape. Lessons without a
+    module the API can name are left out too, rather than being filed under
+    "unknown-module", so they also fall back to the HTML scrape.
+    """
+    slugs = {lesson_slug(link): link for link in links}
+    lessons_endpoint = urljoin(url, REST_LESSONS_ENDPOINT)
+    modules_endpoint = urljoin(url, REST_MODULES_ENDPOINT)
+
+    rest_lessons = []
+    slug_list = list(slugs)
+    for start in range(0, len(slug_list), REST_PAGE_SIZE):
+        rest_lessons += get_rest_json(session, lessons_endpoint, {
+            'slug': ','.join(slug_list[start:start + REST_PAGE_SIZE]),
+            'per_page': REST_PAGE_SIZE,
+            '_fields': f'id,slug,title,content,{REST_MODULE_BASE}',
+        }, cookie_header, nonce)
+
+    # Look up the names of every module the lessons belong to
+    module_ids = sorted({module_id for lesson in rest_lessons for module_id in lesson.get(REST_MODULE_BASE, [])})
+    module_names = {}
+    for start in range(0, len(module_ids), REST_PAGE_SIZE):
+        for module in get_rest_json(session, modules_endpoint, {
+            'include': ','.join(str(module_id) for module_id in module_ids[start:start + REST_PAGE_SIZE]),
+            'per_page': REST_PAGE_SIZE,
+            '_fields': 'id,name',
+        }, cookie_header, nonce):
+            module_names[module['id']] = html.unescape(module['name'])
+
+    lessons = {}
+    for lesson in rest_lessons:
+        if lesson['slug'] not in slugs:
+            continue
+        lesson_modules = lesson.get(REST_MODULE_BASE, [])
+        if not lesson_modules or lesson_modules[0] not in module_names:
+            continue
+        module_name = module_names[lesson_modules[0]]
+
+        soup = BeautifulSoup(lesson['content']['rendered'], 'html.parser')
+        remove_unwanted_elements(soup)
+
+        lesson_title = BeautifulSoup(lesson['title']['rendered'], 'html.parser').get_text(strip=True)
+        lessons[slugs[lesson['slug']]] = (lesson_title, module_name, str(soup))
+
+    logging.info(f"Fetched {len(lessons)} of {len(links)} lessons from the REST API")
+    return lessons
+
+def save_lesson_html(module_number, lesson_number, module_name, lesson_title, content, output):
     """Save a single lesson as an HTML file."""
-    filename = os.path.join(
-        lessons_folder, f"{module_number:02d}_{lesson_number:02d}_{sanitize_filename(lesson_title)}.html"
-    )
-    
-    html_content = f'<html><head><title>{lesson_title}</title></head><body>'
-    html_content += f'<h1>{lesson_title}</h1>'
-    html_content += content
-    html_content += '</body></html>'
+    lesson_path = f"lessons/{module_number:02d}_{lesson_number:02d}_{sanitize_filename(lesson_title)}.html"
 
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(html_content)
+    filename = output.write(lesson_path, lesson_html(lesson_title, content))
     
     logging.info(f"Lesson saved to {filename}")
+    return lesson_path
 
-def save_module_html(module_number, module_name, lessons_content, output_folder):
+def save_module_html(module_number, module_name, lessons_content, output):
     """Save the module content into an HTML file."""
-    combined_html = '<html><head><title>' + module_name + '</title></head><body>'
-    combined_html += f'<h1>{module_name}</h1>'
-
-    for lesson_title, content in lessons_content:
-        soup = BeautifulSoup(content, 'html.parser')
-
-        # Increment the header levels
-        for heading in soup.find_all(['h1','h2', 'h3', 'h4', 'h5', 'h6']):
-            heading.name = f'h{int(heading.name[1]) + 1}'  # Increment header level by 1
-            heading.attrs = {}  # Remove all attributes
-
-        combined_html += str(soup)
-
-    combined_html += '</body></html>'
-
     # Save the HTML file with numbering
-    filename = os.path.join(output_folder, f"{module_number:02d}_{sanitize_filename(module_name)}.html")
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(combined_html)
+    module_path = f"{module_number:02d}_{sanitize_filename(module_name)}.html"
+    filename = output.write(module_path, module_html(module_name, lessons_content))
 
     logging.info(f"Module saved to {filename}")
+    return module_path
+
+def process_lessons(session, links, cookie_header, output, rest_lessons=None):
+    """Process and group lessons by module, and save them individually.
 
-def process_lessons(session, links, cookie_header, output_folder):
-    """Process and group lessons by module, and save them individually."""
+    Lessons already fetched through the REST API are used as they are,
+    anything else is scraped from its lesson page.
+    """
     modules = {}
-    lessons_folder = os.path.join(output_folder, "lessons")
-    os.makedirs(lessons_folder, exist_ok=True)
+    lesson_paths = {}
+    lessons = dict(rest_lessons or {})
+
+    # Download the remaining lessons concurrently across the proxy pool, then save them in course order
+    to_download = [link for link in links if link not in lessons]
+    with ThreadPoolExecutor(max_workers=getattr(session, 'concurrency', 1)) as executor:
+        downloaded = executor.map(lambda link: download_and_process_content(session, link, cookie_header), to_download)
+        lessons.update(zip(to_download, downloaded))
 
     for link in links:
-        lesson_title, module_name, content = download_and_process_content(session, link, cookie_header)
+        lesson_title, module_name, content = lessons[link]
 
         if module_name not in modules:
             modules[module_name] = []
@@ -152,49 +228,55 @@ def process_lessons(session, links, cookie_header, output_folder):
         lesson_number = len(modules[module_name]) + 1
 
         # Save individual lesson HTML file
-        save_lesson_html(module_number, lesson_number, module_name, lesson_title, content, lessons_folder)
+        lesson_path = save_lesson_html(module_number, lesson_number, module_name, lesson_title, content, output)
 
         # Add to module content
         modules[module_name].append((lesson_title, content))
+        lesson_paths.setdefault(module_name, []).append({"title": lesson_title, "url": link, "path": lesson_path})
 
-    return modules
+    return modules, lesson_paths
 
-def combine_all_modules(modules, output_folder):
+def combine_all_modules(modules, output):
     """Combine all modules into a single HTML file."""
-    combined_html = '<html><head><title>All Modules</title></head><body>'
-    combined_html += '<h1>All Modules</h1>'
-
-    for module_number, (module_name, lessons_content) in enumerate(modules.items(), start=1):
-        combined_html += f'<h1>{module_number:02d}. {module_name}</h1>'
-
-        for lesson_title, content in lessons_content:
-            soup = BeautifulSoup(content, 'html.parser')
-
-            # Increment the header levels
-            for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                heading.name = f'h{int(heading.name[1]) + 1}'  # Increment header level by 1
-                heading.attrs = {}  # Remove all attributes
-
-            combined_html += str(soup)
-
-    combined_html += '</body></html>'
-
     # Save the combined HTML file
-    filename = os.path.join(output_folder, "all_modules.html")
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(combined_html)
+    filename = output.write("all_modules.html", all_modules_html(modules.items()))
 
     logging.info(f"All modules combined into {filename}")
 
-def main():
-    if len(sys.argv) != 2:
-        logging.error("Usage: python script.py <URL>")
-        sys.exit(1)
+def save_course(modules, lesson_paths, course_title, url, output):
+    """Save each module, the combined modules file and the course manifest."""
+    # Save each module's content in a separate file
+    manifest = {"course": course_title, "url": url, "modules": []}
+    for module_number, (module_name, lessons_content) in enumerate(modules.items(), start=1):
+        module_path = save_module_html(module_number, module_name, lessons_content, output)
+        manifest["modules"].append({"name": module_name, "path": module_path, "lessons": lesson_paths[module_name]})
+
+    # Combine all modules into a single file
+    combine_all_modules(modules, output)
+    write_manifest(output, manifest)
 
-    url = sys.argv[1]
+def main():
+    parser = argparse.ArgumentParser(description="Scrape a Sensei LMS course into lesson, module and combined HTML files.")
+    parser.add_argument("url", help="URL of the course homepage")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="dir",
+                        help="write a folder of files (default), a single zip archive, a single SQLite database "
+                             "or a snapshot in the content-addressed snapshot store")
+    parser.add_argument("--fetch-mode", choices=('html', 'rest'), default="html",
+                        help="scrape each lesson page (default) or fetch lessons in bulk through the WordPress REST API, "
+                             "falling back to the lesson page for any the API doesn't return")
+    parser.add_argument("--proxy", action="append", dest="proxies", metavar="PROXY_URL",
+                        help="proxy to spread requests over, e.g. socks5://localhost:8081 or 'direct' for no proxy; "
+                             "repeat for a pool (default: socks5://localhost:8080)")
+    parser.add_argument("--proxy-concurrency", type=int, default=1,
+                        help="concurrent requests per proxy (default: 1)")
+    args = parser.parse_args()
+    if args.proxy_concurrency < 1:
+        parser.error("--proxy-concurrency must be at least 1")
+
+    url = args.url
     class_name = 'wp-block-sensei-lms-course-outline-lesson'
     cookie_header = get_cookie_header()
-    session = get_session_with_proxy()
+    session = get_session_with_proxy(args.proxies, args.proxy_concurrency)
 
     logging.info(f"Fetching links from {url}...")
     links = get_links_with_class(session, url, class_name, cookie_header)
@@ -202,23 +284,29 @@ def main():
         logging.warning("No links found with the specified class.")
         sys.exit(0)
 
-    # Create a folder for saving output
+    # Create the output named after the page title
     response = session.get(url, headers={'Cookie': cookie_header})
     log_request_and_response(response)
     response.raise_for_status()
     soup = BeautifulSoup(response.text, 'html.parser')
-    folder_title = "output-" + sanitize_filename(soup.find('title').get_text(strip=True))
-    os.makedirs(folder_title, exist_ok=True)
+    course_title = soup.find('title').get_text(strip=True)
+    folder_title = "output-" + sanitize_filename(course_title)
+    output = open_output(folder_title, args.output_format)
+
+    # Fetch lessons in bulk through the REST API if asked to
+    rest_lessons = {}
+    if args.fetch_mode == 'rest':
+        try:
+            rest_lessons = fetch_lessons_from_rest(session, url, links, cookie_header, get_rest_nonce(response.text))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logging.warning(f"REST API fetch failed, falling back to scraping lesson pages: {e}")
 
     # Process lessons and group them by module
-    modules = process_lessons(session, links, cookie_header, folder_title)
+    modules, lesson_paths = process_lessons(session, links, cookie_header, output, rest_lessons)
 
-    # Save each module's content in a separate file
-    for module_number, (module_name, lessons_content) in enumerate(modules.items(), start=1):
-        save_module_html(module_number, module_name, lessons_content, folder_title)
-
-    # Combine all modules into a single file
-    combine_all_modules(modules, folder_title)
+    save_course(modules, lesson_paths, course_title, url, output)
+    output.close()
+    session.log_stats()
 
     logging.info("Content download, processing, and saving complete.")
 
@@ -1,81 +1,156 @@
-import os
+import re
 import sys
 import csv
 from bs4 import BeautifulSoup
+from course_output import is_lesson_source, iter_lessons, output_path
+from profiling import stage
+from sensei import load_script
 from titlecase import titlecase
 
-def extract_content_from_html(html_content):
-    """Extract content from <p>, <li>, and header tags using BeautifulSoup."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    content_parts = []
-    headers = []
-
-    # Extract text from <p> and <li> tags
-    for tag in soup.find_all(['p', 'li']):
-        content_parts.append(tag.get_text(strip=True))
-
-    # Extract headers (h1 to h6)
-    for header in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-        headers.append(header.get_text(strip=True))
-
-    return "\n".join(content_parts), headers
-
-def find_sentences_missing_punctuation(content):
+BODY_TAGS = ('p', 'li')
+HEADER_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Sentences longer than this many words are flagged
+MAX_SENTENCE_WORDS = 35
+
+# Terms editors should avoid, with what to use instead
+BANNED_TERMS = {
+    "click here": "use descriptive link text",
+    "e-mail": "email",
+    "web site": "website",
+}
+
+# Registered lint rules: rule id -> (issue type, tags it applies to, joined_text, check factory)
+LINT_RULES = {}
+
+def lint_rule(rule_id, issue_type, tags, joined_text=False):
+    """Register a lint rule.
+
+    The decorated function is called once when rules are compiled and
+    returns the check to run on each text block: check(text) -> list of issues.
+    Checks get the block's text with a space between inline elements, so
+    "<a>click here</a>" stays a separate phrase. joined_text=True passes the
+    text with no separator instead, as the original punctuation and header
+    case checks saw it.
+    """
+    def register(factory):
+        LINT_RULES[rule_id] = (issue_type, tags, joined_text, factory)
+        return factory
+    return register
+
+@lint_rule('punctuation', "Sentence Punctuation", BODY_TAGS, joined_text=True)
+def punctuation_rule():
     """Identify sentences in the content that do not end with . : ? or !."""
-    issues = []
-    sentences = content.split('\n')
-    for sentence in sentences:
-        stripped_sentence = sentence.strip()
-        if stripped_sentence and not stripped_sentence.endswith(('.', ':', '?', '!','”')):
-            issues.append(stripped_sentence)
-    return issues
-
-def find_non_title_case_headers(headers):
-    """Identify headers that are not in title case."""
-    issues = []
-    for header in headers:
-        title_case_header = titlecase(header, callback=case_exceptions)
-        if header != titlecase(header):
-            issues.append(header + " -> " + titlecase(header))
-    return issues
+    def check(text):
+        issues = []
+        for sentence in text.split('\n'):
+            stripped_sentence = sentence.strip()
+            if stripped_sentence and not stripped_sentence.endswith(('.', ':', '?', '!','”')):
+                issues.append(stripped_sentence)
+        return issues
+    return check
 
 def case_exceptions(word, **kwargs):
    if word.upper() in ('TCP', 'UDP', 'VS'):
      return word.upper()
 
-def process_files(lesson_folder_path, output_csv_path):
-    """Process all files in the given folder and find sentences and headers with issues."""
-    grammar_issues = []
-
-    for filename in os.listdir(lesson_folder_path):
-        if filename.endswith('.html'):
-            lesson_path = os.path.join(lesson_folder_path, filename)
-
-            with open(lesson_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
-
-                # Extract content and headers directly from HTML
-                content, headers = extract_content_from_html(html_content)
-
-                # Find sentences missing punctuation
-                sentence_issues = find_sentences_missing_punctuation(content)
-
-                # Find headers not in title case
-                header_issues = find_non_title_case_headers(headers)
-
-                for issue in sentence_issues:
-                    grammar_issues.append({"filename": filename, "issue": issue, "type": "Sentence Punctuation"})
+@lint_rule('title-case', "Header Case", HEADER_TAGS, joined_text=True)
+def title_case_rule():
+    """Identify headers that are not in title case."""
+    def check(text):
+        title_case_header = titlecase(text, callback=case_exceptions)
+        if text != title_case_header:
+            return [text + " -> " + title_case_header]
+        return []
+    return check
+
+@lint_rule('banned-term', "Banned Term", BODY_TAGS + HEADER_TAGS)
+def banned_term_rule():
+    """Identify terms from BANNED_TERMS."""
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in BANNED_TERMS) + r')\b', re.IGNORECASE)
+
+    def check(text):
+        return [f"{match.group(0)} -> {BANNED_TERMS[match.group(0).lower()]}" for match in pattern.finditer(text)]
+    return check
+
+@lint_rule('trademark', "Trademark Casing", BODY_TAGS + HEADER_TAGS)
+def trademark_rule():
+    """Identify trademarks from process-titles.py that aren't cased exactly as specified."""
+    trademarks = load_script('process-titles.py').TRADEMARK_EXCEPTIONS
+    canonical = {trademark.lower(): trademark for trademark in trademarks}
+    # Longest first so WordPress.com wins over WordPress
+    alternatives = '|'.join(re.escape(trademark) for trademark in sorted(trademarks, key=len, reverse=True))
+    pattern = re.compile(r'(?<![\w.-])(' + alternatives + r')(?![\w-])', re.IGNORECASE)
+
+    def check(text):
+        return [
+            f"{match.group(0)} -> {canonical[match.group(0).lower()]}"
+            for match in pattern.finditer(text)
+            if match.group(0) != canonical[match.group(0).lower()]
+        ]
+    return check
+
+@lint_rule('long-sentence', "Long Sentence", BODY_TAGS)
+def long_sentence_rule():
+    """Identify sentences longer than MAX_SENTENCE_WORDS words."""
+    sentence_end = re.compile(r'(?<=[.!?])\s+')
+
+    def check(text):
+        issues = []
+        for sentence in sentence_end.split(text):
+            words = len(sentence.split())
+            if words > MAX_SENTENCE_WORDS:
+                issues.append(f"({words} words) {sentence}")
+        return issues
+    return check
+
+def compile_rules(rule_ids=None):
+    """Build each rule's check once and index them by the tag they apply to."""
+    rules_by_tag = {}
+    for rule_id in rule_ids or LINT_RULES:
+        issue_type, tags, joined_text, factory = LINT_RULES[rule_id]
+        check = factory()
+        for tag in tags:
+            rules_by_tag.setdefault(tag, []).append((rule_id, issue_type, joined_text, check))
+    return rules_by_tag
+
+def iter_text_blocks(html_content):
+    """Yield (tag name, location, element) for every <p>, <li> and header in document order, in one pass over the tree."""
+    with stage('parse'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+    with stage('extract'):
+        tags = soup.find_all(BODY_TAGS + HEADER_TAGS)
+    counts = {}
+    for tag in tags:
+        counts[tag.name] = counts.get(tag.name, 0) + 1
+        yield tag.name, f"{tag.name} {counts[tag.name]}", tag
+
+def lint_lesson(html_content, rules_by_tag):
+    """Run every compiled rule over a lesson's text blocks."""
+    for tag, location, element in iter_text_blocks(html_content):
+        texts = {}
+        for rule_id, issue_type, joined_text, check in rules_by_tag.get(tag, ()):
+            if joined_text not in texts:
+                with stage('extract'):
+                    texts[joined_text] = element.get_text('' if joined_text else ' ', strip=True)
+            with stage('check'):
+                issues = check(texts[joined_text])
+            for issue in issues:
+                yield {"rule": rule_id, "type": issue_type, "location": location, "issue": issue}
 
-                for issue in header_issues:
-                    grammar_issues.append({"filename": filename, "issue": issue, "type": "Header Case"})
+def process_files(lesson_folder_path, output_csv_path):
+    """Process all files in the given folder and write the lint issues found to a CSV file."""
+    rules_by_tag = compile_rules()
 
-    # Write all grammar issues to a CSV file
     with open(output_csv_path, 'w', encoding='utf-8', newline='') as csvfile:
-        fieldnames = ["filename", "issue", "type"]
+        fieldnames = ["filename", "issue", "type", "rule", "location"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
         writer.writeheader()
-        writer.writerows(grammar_issues)
+
+        for filename, html_content in iter_lessons(lesson_folder_path):
+            for issue in lint_lesson(html_content, rules_by_tag):
+                with stage('write'):
+                    writer.writerow({"filename": filename, **issue})
 
     print(f"Issues saved to {output_csv_path}")
 
@@ -86,12 +161,12 @@ def main():
 
     lesson_folder_path = sys.argv[1]
 
-    if not os.path.isdir(lesson_folder_path):
-        print(f"Error: '{lesson_folder_path}' is not a valid directory.")
+    if not is_lesson_source(lesson_folder_path):
+        print(f"Error: '{lesson_folder_path}' is not a valid directory or scraper archive.")
         sys.exit(1)
 
     # Define the output CSV file
-    output_csv_path = os.path.join(os.path.dirname(lesson_folder_path), 'punctuation_issues.csv')
+    output_csv_path = output_path(lesson_folder_path, 'punctuation_issues.csv')
 
     process_files(lesson_folder_path, output_csv_path)
     print("Punctuation and header case check complete.")
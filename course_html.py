@@ -0,0 +1,54 @@
+from bs4 import BeautifulSoup
+
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+def lesson_html(lesson_title, content):
+    """Wrap a lesson's cleaned content into the page the scraper saves for it."""
+    html_content = f'<html><head><title>{lesson_title}</title></head><body>'
+    html_content += f'<h1>{lesson_title}</h1>'
+    html_content += content
+    html_content += '</body></html>'
+    return html_content
+
+def lesson_content(html_content, lesson_title):
+    """Get a lesson's cleaned content back out of the page lesson_html built."""
+    prefix = lesson_html(lesson_title, '')[:-len('</body></html>')]
+    if not html_content.startswith(prefix) or not html_content.endswith('</body></html>'):
+        raise ValueError(f"'{lesson_title}' wasn't saved by the scraper")
+    return html_content[len(prefix):-len('</body></html>')]
+
+def demote_headings(content):
+    """Move every heading in a lesson down a level so it nests under a module heading."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Increment the header levels
+    for heading in soup.find_all(HEADING_TAGS):
+        heading.name = f'h{int(heading.name[1]) + 1}'  # Increment header level by 1
+        heading.attrs = {}  # Remove all attributes
+
+    return str(soup)
+
+def module_html(module_name, lessons_content):
+    """Combine a module's (lesson_title, content) pairs into one page."""
+    combined_html = '<html><head><title>' + module_name + '</title></head><body>'
+    combined_html += f'<h1>{module_name}</h1>'
+
+    for lesson_title, content in lessons_content:
+        combined_html += demote_headings(content)
+
+    combined_html += '</body></html>'
+    return combined_html
+
+def all_modules_html(modules):
+    """Combine every module, given as (module_name, lessons_content) pairs in course order, into one page."""
+    combined_html = '<html><head><title>All Modules</title></head><body>'
+    combined_html += '<h1>All Modules</h1>'
+
+    for module_number, (module_name, lessons_content) in enumerate(modules, start=1):
+        combined_html += f'<h1>{module_number:02d}. {module_name}</h1>'
+
+        for lesson_title, content in lessons_content:
+            combined_html += demote_headings(content)
+
+    combined_html += '</body></html>'
+    return combined_html
@@ -0,0 +1,238 @@
+import os
+import json
+import sqlite3
+import zipfile
+import logging
+from profiling import stage
+from snapshot_store import SnapshotOutput, load_snapshot, read_snapshot_file, snapshot_paths
+
+OUTPUT_FORMATS = ('dir', 'zip', 'sqlite', 'snapshot')
+
+class DirectoryOutput:
+    """Write scraper output as a folder of files."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, relative_path, content):
+        filename = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return filename
+
+    def close(self):
+        pass
+
+class ZipOutput:
+    """Write scraper output sequentially into a single zip archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, relative_path, content):
+        self.archive.writestr(relative_path, content)
+        return f"{self.path}:{relative_path}"
+
+    def close(self):
+        self.archive.close()
+
+class SQLiteOutput:
+    """Write scraper output into a single SQLite database, one row per file."""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE files (path TEXT PRIMARY KEY, content TEXT NOT NULL)")
+
+    def write(self, relative_path, content):
+        self.conn.execute("INSERT OR REPLACE INTO files (path, content) VALUES (?, ?)", (relative_path, content))
+        return f"{self.path}:{relative_path}"
+
+    def close(self):
+        # Everything is written in one transaction
+        self.conn.commit()
+        self.conn.close()
+
+def open_output(folder_title, output_format):
+    """Open the output backend for a course, named after its folder title."""
+    if output_format == 'zip':
+        return ZipOutput(folder_title + '.zip')
+    if output_format == 'sqlite':
+        return SQLiteOutput(folder_title + '.sqlite')
+    if output_format == 'snapshot':
+        return SnapshotOutput(folder_title)
+    return DirectoryOutput(folder_title)
+
+def write_manifest(output, manifest):
+    """Save the course manifest (modules and their lessons) as manifest.json."""
+    filename = output.write('manifest.json', json.dumps(manifest, indent=2))
+    logging.info(f"Manifest saved to {filename}")
+
+def archive_paths(source, prefix=''):
+    """List the HTML files directly under a prefix in a zip, SQLite or snapshot output."""
+    if source.endswith('.snapshot'):
+        names = snapshot_paths(load_snapshot(source))
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = archive.namelist()
+    else:
+        conn = sqlite3.connect(source)
+        try:
+            names = [row[0] for row in conn.execute("SELECT path FROM files")]
+        finally:
+            conn.close()
+    return sorted(
+        name for name in names
+        if name.startswith(prefix) and '/' not in name[len(prefix):] and name.endswith('.html')
+    )
+
+def read_archive_files(source, prefix=''):
+    """Yield (path, content) for HTML files directly under a prefix in a zip, SQLite or snapshot output."""
+    names = archive_paths(source, prefix)
+    if source.endswith('.snapshot'):
+        snapshot = load_snapshot(source)
+        for name in names:
+            with stage('read'):
+                content = read_snapshot_file(source, name, snapshot)
+            yield name, content
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in names:
+                with stage('read'):
+                    content = archive.read(name).decode('utf-8')
+                yield name, content
+    else:
+        conn = sqlite3.connect(source)
+        try:
+            for name in names:
+                with stage('read'):
+                    content = conn.execute("SELECT content FROM files WHERE path = ?", (name,)).fetchone()[0]
+                yield name, content
+        finally:
+            conn.close()
+
+def is_lesson_source(source):
+    """Check that a path is a lesson folder or a zip/SQLite/snapshot scraper output."""
+    return os.path.isdir(source) or source.endswith(('.zip', '.sqlite', '.snapshot')) and os.path.isfile(source)
+
+def course_name(source):
+    """Name a lesson source's course after the scraper's output folder, whatever format it was saved in.
+
+    A lesson folder's course is its parent folder and a snapshot's is the
+    course folder it's stored in, a zip or SQLite archive is named after it.
+    """
+    if os.path.isdir(source) or source.endswith('.snapshot'):
+        return os.path.basename(os.path.dirname(os.path.abspath(source)))
+    return os.path.splitext(os.path.basename(source))[0]
+
+def output_path(source, filename):
+    """Where an analysis script saves a file (a report or a cache) about a lesson source.
+
+    A lesson folder's files go in its course folder and a snapshot's in the
+    folder of its course's snapshots. Zip and SQLite archives often share a
+    folder, so their files go beside the archive named after it, e.g.
+    output-course_questions.db for output-course.zip.
+    """
+    source = os.path.normpath(source)
+    if os.path.isdir(source) or source.endswith('.snapshot'):
+        return os.path.join(os.path.dirname(source), filename)
+    return os.path.join(os.path.dirname(source), f"{os.path.splitext(os.path.basename(source))[0]}_{filename}")
+
+def iter_lessons(source):
+    """Yield (filename, html_content) for every lesson in a folder or scraper archive."""
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith('.html'):
+                with stage('read'), open(os.path.join(source, filename), 'r', encoding='utf-8') as file:
+                    html_content = file.read()
+                yield filename, html_content
+    else:
+        for name, content in read_archive_files(source, 'lessons/'):
+            yield os.path.basename(name), content
+
+def read_lesson(source, filename):
+    """Read a single lesson by filename from a folder or scraper archive."""
+    if os.path.isdir(source):
+        with open(os.path.join(source, filename), 'r', encoding='utf-8') as file:
+            return file.read()
+
+    name = 'lessons/' + filename
+    if source.endswith('.snapshot'):
+        return read_snapshot_file(source, name)
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            return archive.read(name).decode('utf-8')
+
+    conn = sqlite3.connect(source)
+    try:
+        row = conn.execute("SELECT content FROM files WHERE path = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise FileNotFoundError(f"Lesson '{filename}' not found in '{source}'")
+    return row[0]
+
+def list_modules(source):
+    """Return the module file names (without extension) of a lesson folder's course or a scraper archive."""
+    if os.path.isdir(source):
+        parent_folder = os.path.dirname(os.path.abspath(source))
+        filenames = [filename for filename in os.listdir(parent_folder) if filename.endswith('.html')]
+    else:
+        filenames = archive_paths(source)
+    return sorted(os.path.splitext(filename)[0] for filename in filenames)
+
+def module_map(source):
+    """Map module numbers to module file names (without extension) for a lesson folder or scraper archive.
+
+    Build this once per source and pass it to module_for_lesson, rather than
+    listing the course again for every lesson.
+    """
+    modules = {}
+    for module_name in list_modules(source):
+        module_number = module_name.split('_', 1)[0]
+        if module_number.isdigit():
+            modules.setdefault(module_number, module_name)
+    return modules
+
+def module_for_lesson(filename, modules):
+    """Work out the module a lesson belongs to from the scraper's file naming.
+
+    Lessons are saved as <module>_<lesson>_<title>.html and modules as
+    <module>_<name>.html alongside the lessons folder, so use the module
+    file's name from module_map when it exists and fall back to the module number.
+    """
+    module_number = filename.split('_', 1)[0]
+    if not module_number.isdigit():
+        return "unknown-module"
+    return modules.get(module_number, module_number)
+
+def read_manifest(source):
+    """Read the manifest.json the scraper saved with a course, or None if there isn't one."""
+    if os.path.isdir(source):
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(source)), 'manifest.json')
+        if not os.path.isfile(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    if source.endswith('.snapshot'):
+        if 'manifest.json' not in load_snapshot(source)["files"]:
+            return None
+        return json.loads(read_snapshot_file(source, 'manifest.json'))
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            if 'manifest.json' not in archive.namelist():
+                return None
+            return json.loads(archive.read('manifest.json').decode('utf-8'))
+
+    conn = sqlite3.connect(source)
+    try:
+        row = conn.execute("SELECT content FROM files WHERE path = 'manifest.json'").fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from bs4 import BeautifulSoup
+from course_output import is_lesson_source, iter_lessons, module_for_lesson, module_map, read_manifest
+from profiling import stage
+
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+# bm25 column weights: title, headings, body
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+
+def open_search_index(db_path):
+    """Open (and create if needed) the lesson search index."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS lessons (
+            id INTEGER PRIMARY KEY,
+            source TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            course TEXT NOT NULL,
+            module TEXT NOT NULL,
+            title TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            indexed_at TEXT NOT NULL,
+            UNIQUE (source, filename)
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS lesson_fts USING fts5(
+            title, headings, body, tokenize = 'porter unicode61'
+        );
+    """)
+    return conn
+
+def extract_fields(html_content):
+    """Split a lesson into its title, heading text and body text."""
+    with stage('parse'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+    with stage('extract'):
+        h1_tag = soup.find('h1')
+        title = h1_tag.get_text(strip=True) if h1_tag else ''
+
+        headings = []
+        for heading in soup.find_all(HEADING_TAGS):
+            headings.append(heading.get_text(' ', strip=True))
+            heading.decompose()
+        if soup.title:
+            soup.title.decompose()
+
+        return title, "\n".join(headings), soup.get_text(' ', strip=True)
+
+def course_metadata(source):
+    """Return the course name and a lesson filename -> module name map for a lesson source."""
+    manifest = read_manifest(source)
+    if manifest is None:
+        course = os.path.basename(os.path.dirname(os.path.abspath(source))) if os.path.isdir(source) else os.path.basename(source)
+        return course, {}
+
+    modules = {}
+    for module in manifest["modules"]:
+        for lesson in module["lessons"]:
+            modules[os.path.basename(lesson["path"])] = module["name"]
+    return manifest["course"], modules
+
+def index_lessons(conn, source):
+    """Add a lesson source to the index, only re-indexing lessons whose content changed.
+
+    Lessons that have disappeared from the source are removed from the index.
+    Returns (added, updated, removed, unchanged) counts.
+    """
+    source_key = os.path.abspath(source)
+    course, modules = course_metadata(source)
+    module_numbers = module_map(source)
+    existing = {
+        row['filename']: (row['id'], row['content_hash'])
+        for row in conn.execute("SELECT id, filename, content_hash FROM lessons WHERE source = ?", (source_key,))
+    }
+    indexed_at = datetime.now(timezone.utc).isoformat()
+    added = updated = unchanged = 0
+
+    with conn:
+        for filename, html_content in iter_lessons(source):
+            content_hash = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+            lesson_id, indexed_hash = existing.pop(filename, (None, None))
+            if indexed_hash == content_hash:
+                unchanged += 1
+                continue
+
+            title, headings, body = extract_fields(html_content)
+            module = modules.get(filename) or module_for_lesson(filename, module_numbers)
+            if lesson_id is None:
+                lesson_id = conn.execute(
+                    "INSERT INTO lessons (source, filename, course, module, title, content_hash, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source_key, filename, course, module, title, content_hash, indexed_at)
+                ).lastrowid
+                added += 1
+            else:
+                conn.execute(
+                    "UPDATE lessons SET course = ?, module = ?, title = ?, content_hash = ?, indexed_at = ? WHERE id = ?",
+                    (course, module, title, content_hash, indexed_at, lesson_id)
+                )
+                conn.execute("DELETE FROM lesson_fts WHERE rowid = ?", (lesson_id,))
+                updated += 1
+            with stage('write'):
+                conn.execute(
+                    "INSERT INTO lesson_fts (rowid, title, headings, body) VALUES (?, ?, ?, ?)",
+                    (lesson_id, title, headings, body)
+                )
+
+        for lesson_id, _ in existing.values():
+            conn.execute("DELETE FROM lesson_fts WHERE rowid = ?", (lesson_id,))
+            conn.execute("DELETE FROM lessons WHERE id = ?", (lesson_id,))
+
+    return added, updated, len(existing), unchanged
+
+def search_lessons(conn, query, limit=20):
+    """Return the best matching lessons for an FTS5 query, with a highlighted body snippet."""
+    return conn.execute(
+        "SELECT lessons.course, lessons.module, lessons.filename, lessons.title, "
+        "snippet(lesson_fts, -1, '[', ']', '...', 16) AS snippet, "
+        f"bm25(lesson_fts, {', '.join(str(weight) for weight in RANK_WEIGHTS)}) AS rank "
+        "FROM lesson_fts JOIN lessons ON lessons.id = lesson_fts.rowid "
+        "WHERE lesson_fts MATCH ? ORDER BY rank LIMIT ?",
+        (query, limit)
+    ).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over scraped lessons.")
+    parser.add_argument("index", help="path to the search index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="add or refresh lesson folders or scraper archives")
+    index_parser.add_argument("sources", nargs="+", help="lesson folders or scraper archives")
+
+    search_parser = commands.add_parser("search", help="find lessons matching a query")
+    search_parser.add_argument("query", help="FTS5 query, e.g. 'object cache' or title:php")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = open_search_index(args.index)
+
+    if args.command == "index":
+        for source in args.sources:
+            if not is_lesson_source(source):
+                print(f"Error: '{source}' is not a valid directory or scraper archive.")
+                sys.exit(1)
+            added, updated, removed, unchanged = index_lessons(conn, source)
+            print(f"{source}: {added} added, {updated} updated, {removed} removed, {unchanged} unchanged")
+        return
+
+    started = time.perf_counter()
+    try:
+        results = search_lessons(conn, args.query, args.limit)
+    except sqlite3.OperationalError as e:
+        print(f"Error: invalid search query: {e}")
+        sys.exit(1)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    for number, result in enumerate(results, 1):
+        print(f"{number}. {result['title']} ({result['course']} / {result['module']} / {result['filename']})")
+        print(f"   {result['snippet']}")
+    print(f"{len(results)} results in {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import re
+import sys
+import csv
+import zlib
+import array
+import random
+import sqlite3
+import hashlib
+from bs4 import BeautifulSoup
+from course_output import is_lesson_source, iter_lessons, output_path
+from profiling import stage
+
+# MinHash settings: words per shingle and number of hash permutations
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are comparable between runs
+_random = random.Random(1)
+PERMUTATIONS = [
+    (_random.randint(1, MERSENNE_PRIME - 1), _random.randint(0, MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+def lesson_text(html_content):
+    """Extract the normalised word list of a lesson."""
+    with stage('parse'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+    with stage('extract'):
+        return re.findall(r'\w+', soup.get_text(' ', strip=True).lower())
+
+def shingle_hashes(words):
+    """Hash every run of SHINGLE_SIZE words into a 32-bit integer."""
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {
+        zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def minhash_signature(hashes):
+    """Build the MinHash signature for a set of shingle hashes."""
+    return tuple(
+        min(((a * x + b) % MERSENNE_PRIME) & MAX_HASH for x in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimate the Jaccard similarity of two lessons from their signatures."""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / NUM_PERM
+
+def lsh_bands(threshold):
+    """Pick the LSH band count whose detection threshold sits just below the requested one.
+
+    Thresholds below the lowest one NUM_PERM permutations can detect use that lowest one.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError(f"Similarity threshold must be above 0 and at most 1, got {threshold}")
+    options = [
+        (bands, NUM_PERM // bands) for bands in range(1, NUM_PERM + 1)
+        if NUM_PERM % bands == 0
+    ]
+
+    def detection_threshold(option):
+        bands, rows = option
+        return (1 / bands) ** (1 / rows)
+
+    below = [option for option in options if detection_threshold(option) <= threshold]
+    if not below:
+        return min(options, key=detection_threshold)
+    return max(below, key=detection_threshold)
+
+def signature_cache_path(lesson_folder_path):
+    """Signatures are cached next to the lesson folder, like the duplicate report."""
+    return output_path(lesson_folder_path, 'lesson_signatures.db')
+
+def open_signature_cache(cache_path):
+    """Open (and create if needed) the MinHash signature cache, keyed by lesson content hash."""
+    conn = sqlite3.connect(cache_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS signatures (content_hash TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+    return conn
+
+def build_index(lesson_folder_path, cache_path=None):
+    """Compute a MinHash signature for every lesson in the folder.
+
+    With a cache_path, signatures of lessons whose content hasn't changed are
+    read from the cache instead of being computed again.
+    """
+    conn = open_signature_cache(cache_path) if cache_path else None
+    signatures = {}
+    try:
+        for filename, html_content in iter_lessons(lesson_folder_path):
+            lesson_hash = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+            if conn:
+                row = conn.execute("SELECT signature FROM signatures WHERE content_hash = ?", (lesson_hash,)).fetchone()
+                if row and len(row[0]) == NUM_PERM * array.array('I').itemsize:
+                    signatures[filename] = tuple(array.array('I', row[0]))
+                    continue
+
+            words = lesson_text(html_content)
+            with stage('check'):
+                signatures[filename] = minhash_signature(shingle_hashes(words))
+            if conn:
+                conn.execute("INSERT OR REPLACE INTO signatures (content_hash, signature) VALUES (?, ?)",
+                             (lesson_hash, array.array('I', signatures[filename]).tobytes()))
+        if conn:
+            conn.commit()
+    finally:
+        if conn:
+            conn.close()
+    return signatures
+
+def find_duplicate_clusters(signatures, threshold=DEFAULT_THRESHOLD):
+    """Group lessons around a canonical lesson they match at or above the threshold.
+
+    Candidate pairs come from LSH buckets, so only lessons sharing a band
+    are compared. Lessons are taken in sorted order: each one not yet in a
+    cluster starts a new one and takes every unclustered lesson that matches
+    it. Similarity isn't transitive, so clusters aren't chained: every member
+    matches the cluster's first lesson, even if it matches nothing else.
+    Returns a list of sorted filename clusters of two or more, canonical first.
+    """
+    bands, rows = lsh_bands(threshold)
+    buckets = {}
+    for filename, signature in signatures.items():
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows])
+            buckets.setdefault(key, []).append(filename)
+
+    matches = {filename: set() for filename in signatures}
+    checked = set()
+    for bucket in buckets.values():
+        for i, first in enumerate(bucket):
+            for second in bucket[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                if estimated_similarity(signatures[first], signatures[second]) >= threshold:
+                    matches[first].add(second)
+                    matches[second].add(first)
+
+    clustered = set()
+    clusters = []
+    for filename in sorted(signatures):
+        if filename in clustered:
+            continue
+        # Anything before this lesson that matches it is already in a cluster
+        members = sorted(match for match in matches[filename] if match not in clustered)
+        if members:
+            clusters.append([filename] + members)
+            clustered.update(clusters[-1])
+    return clusters
+
+def canonical_lessons(lesson_folder_path, threshold=DEFAULT_THRESHOLD):
+    """Map each near-duplicate lesson to the first lesson of its cluster, which it matches.
+
+    Lessons processed in sorted order will always see their canonical
+    lesson first, so its results can be reused.
+    """
+    signatures = build_index(lesson_folder_path, signature_cache_path(lesson_folder_path))
+    with stage('check'):
+        clusters = find_duplicate_clusters(signatures, threshold)
+
+    canonical = {}
+    for cluster in clusters:
+        for filename in cluster[1:]:
+            canonical[filename] = cluster[0]
+    return canonical
+
+def write_report(clusters, signatures, output_csv_path):
+    """Write the duplicate clusters to a CSV file."""
+    with stage('write'), open(output_csv_path, 'w', encoding='utf-8', newline='') as csvfile:
+        fieldnames = ["cluster", "filename", "canonical", "similarity"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+        for cluster_number, cluster in enumerate(clusters, 1):
+            for filename in cluster:
+                writer.writerow({
+                    "cluster": cluster_number,
+                    "filename": filename,
+                    "canonical": cluster[0],
+                    "similarity": f"{estimated_similarity(signatures[cluster[0]], signatures[filename]):.2f}"
+                })
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python lesson_similarity.py <lesson_folder_path> [threshold]")
+        sys.exit(1)
+
+    lesson_folder_path = sys.argv[1]
+    try:
+        threshold = float(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_THRESHOLD
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 < threshold <= 1:
+        print("Error: threshold must be a number above 0 and at most 1.")
+        sys.exit(1)
+
+    if not is_lesson_source(lesson_folder_path):
+        print(f"Error: '{lesson_folder_path}' is not a valid directory or scraper archive.")
+        sys.exit(1)
+
+    signatures = build_index(lesson_folder_path, signature_cache_path(lesson_folder_path))
+    with stage('check'):
+        clusters = find_duplicate_clusters(signatures, threshold)
+
+    for cluster_number, cluster in enumerate(clusters, 1):
+        print(f"Cluster {cluster_number}: {', '.join(cluster)}")
+
+    # One question generation call per lesson, so every duplicate is a saved call
+    saved_calls = sum(len(cluster) - 1 for cluster in clusters)
+    print(f"{len(clusters)} duplicate clusters across {len(signatures)} lessons, "
+          f"{saved_calls} question generation calls saved.")
+
+    output_csv_path = output_path(lesson_folder_path, 'duplicate_lessons.csv')
+    write_report(clusters, signatures, output_csv_path)
+    print(f"Duplicate report saved to {output_csv_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import csv
+import json
+import time
+
+# Every LLM call made during this run
+llm_calls = []
+run_started = time.perf_counter()
+
+# Retries after a failed attempt, waiting RETRY_DELAY seconds then doubling
+MAX_RETRIES = 2
+RETRY_DELAY = 0.5
+
+def record_llm_call(model, lesson, prompt_tokens=0, completion_tokens=0, time_to_first_token=None,
+                    latency=0.0, retries=0, cache_hit=False, error=None):
+    """Record the token counts and timings of a single LLM call, or why it failed."""
+    call = {
+        "model": model,
+        "lesson": lesson,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "time_to_first_token": time_to_first_token,
+        "latency": latency,
+        "retries": retries,
+        "cache_hit": cache_hit,
+        "error": error,
+    }
+    llm_calls.append(call)
+
+    if cache_hit:
+        print(f"[{model}] cache hit for {lesson}")
+    elif error is not None:
+        print(f"[{model}] failed after {retries} retries in {latency:.2f}s: {error}")
+    else:
+        print(f"[{model}] {prompt_tokens} prompt + {completion_tokens} completion tokens in {latency:.2f}s")
+    return call
+
+def call_with_retries(model, lesson, attempt, should_retry):
+    """Make an LLM call, retrying failed attempts, and record it.
+
+    attempt() makes one call and returns (result, metrics), where metrics are
+    record_llm_call's token and timing arguments. Attempts that fail with an
+    error should_retry accepts are retried up to MAX_RETRIES times. The call is
+    recorded once with the number of retries it took. A call that still fails
+    is recorded with its error and the error is raised again.
+    """
+    for retries in range(MAX_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            result, metrics = attempt()
+        except Exception as e:
+            if retries < MAX_RETRIES and should_retry(e):
+                time.sleep(RETRY_DELAY * 2 ** retries)
+                continue
+            record_llm_call(model, lesson, latency=time.perf_counter() - started, retries=retries,
+                            error=f"{type(e).__name__}: {e}")
+            raise
+        record_llm_call(model, lesson, retries=retries, **metrics)
+        return result
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def summarise_calls(calls):
+    """Aggregate a group of calls into totals, latency percentiles and throughput."""
+    made = [call for call in calls if not call["cache_hit"]]
+    # Failed calls count towards the time spent on the model, but not its latency or throughput
+    answered = [call for call in made if call["error"] is None]
+    latencies = [call["latency"] for call in answered]
+    first_tokens = [call["time_to_first_token"] for call in answered if call["time_to_first_token"] is not None]
+    completion_tokens = sum(call["completion_tokens"] for call in answered)
+    llm_seconds = sum(call["latency"] for call in made)
+    answered_seconds = sum(latencies)
+
+    return {
+        "calls": len(made),
+        "cache_hits": len(calls) - len(made),
+        "retries": sum(call["retries"] for call in calls),
+        "errors": len(made) - len(answered),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in made),
+        "completion_tokens": completion_tokens,
+        "llm_seconds": round(llm_seconds, 3),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "time_to_first_token_p50": percentile(first_tokens, 50),
+        "time_to_first_token_p95": percentile(first_tokens, 95),
+        "tokens_per_second": round(completion_tokens / answered_seconds, 2) if answered_seconds else None,
+    }
+
+def group_calls(key):
+    """Group recorded calls by the given field."""
+    groups = {}
+    for call in llm_calls:
+        groups.setdefault(call[key], []).append(call)
+    return groups
+
+def build_report():
+    """Build the run report: overall, per model and per lesson summaries."""
+    run_seconds = time.perf_counter() - run_started
+    overall = summarise_calls(llm_calls)
+    overall["run_seconds"] = round(run_seconds, 3)
+    # Time not spent waiting on the model is our own overhead
+    overall["overhead_seconds"] = round(run_seconds - overall["llm_seconds"], 3)
+
+    return {
+        "overall": overall,
+        "models": {model: summarise_calls(calls) for model, calls in group_calls("model").items()},
+        "lessons": {lesson: summarise_calls(calls) for lesson, calls in group_calls("lesson").items()},
+        "calls": llm_calls,
+    }
+
+def write_report(report_path):
+    """Write the run report as <report_path>.json and a per model/lesson <report_path>.csv."""
+    report = build_report()
+
+    with open(report_path + '.json', 'w', encoding='utf-8') as json_file:
+        json.dump(report, json_file, indent=2)
+
+    with open(report_path + '.csv', 'w', encoding='utf-8', newline='') as csvfile:
+        fieldnames = ["group", "name"] + list(report["overall"].keys())
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval='')
+
+        writer.writeheader()
+        writer.writerow({"group": "overall", "name": "", **report["overall"]})
+        for group in ("models", "lessons"):
+            for name, summary in report[group].items():
+                writer.writerow({"group": group[:-1], "name": name, **summary})
+
+    print(f"LLM call report saved to {report_path}.json and {report_path}.csv")
+    return report
@@ -1,20 +1,59 @@
 import os
 import sys
 import csv
+import re
+import time
 import subprocess
 from bs4 import BeautifulSoup
+from course_output import is_lesson_source, iter_lessons
+from profiling import stage
+from llm_metrics import call_with_retries, record_llm_call, write_report
 
-def to_title_case_with_ollama_cli(text):
+MODEL = "mistral"
+
+DURATION_UNITS = {"s": 1.0, "ms": 1e-3, "µs": 1e-6, "us": 1e-6, "ns": 1e-9}
+
+def parse_verbose_stats(output):
+    """Parse the timing statistics `ollama run --verbose` prints to stderr."""
+    stats = {}
+    for name, value in re.findall(r'^([a-z ]+):\s+(\S+)', output, re.MULTILINE):
+        count = re.match(r'^(\d+)$', value)
+        duration = re.match(r'^([\d.]+)(s|ms|µs|us|ns)$', value)
+        if count:
+            stats[name] = int(count.group(1))
+        elif duration:
+            stats[name] = float(duration.group(1)) * DURATION_UNITS[duration.group(2)]
+    return stats
+
+def to_title_case_with_ollama_cli(text, lesson=None):
     """Use Ollama CLI with Mistral model to convert text to title case."""
     prompt = f"Convert the following text to title case while maintaining context:\n\n{text}\n\nReturn only the corrected title in title case."
-    try:
+
+    def ask_model():
+        started = time.perf_counter()
         result = subprocess.run(
-            ["ollama", "run", "mistral", prompt],
+            ["ollama", "run", "--verbose", MODEL, prompt],
             capture_output=True,
             text=True,
             check=True
         )
-        corrected_title = result.stdout.strip()
+        latency = time.perf_counter() - started
+
+        # The CLI doesn't stream to us, so the first token arrives once the
+        # model has loaded and evaluated the prompt
+        stats = parse_verbose_stats(result.stderr)
+        return result.stdout, {
+            "prompt_tokens": stats.get("prompt eval count", 0),
+            "completion_tokens": stats.get("eval count", 0),
+            "time_to_first_token": stats.get("load duration", 0.0) + stats.get("prompt eval duration", 0.0) if stats else None,
+            "latency": latency,
+        }
+
+    try:
+        # A failing CLI run is usually the server not being up yet, so it's worth another try
+        output = call_with_retries(MODEL, lesson, ask_model, lambda error: isinstance(error, subprocess.CalledProcessError))
+
+        corrected_title = output.strip()
         if not corrected_title:
             print(f"Error: Empty response for title '{text}'")
             corrected_title = text.title()  # Fallback to basic title case
@@ -23,33 +62,52 @@ def to_title_case_with_ollama_cli(text):
         print(f"Error calling Ollama CLI: {e}")
         return text.title()  # Fallback in case of error
 
+def correct_lesson_titles(html_content, lesson_name, corrections):
+    """Return (original, corrected) for every heading in a lesson that needs correcting.
+
+    corrections caches earlier answers so repeated headings don't call the model again.
+    """
+    with stage('parse'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+    with stage('extract'):
+        titles = [tag.get_text(strip=True) for heading in range(1, 8) for tag in soup.find_all(f'h{heading}')]
+
+    changed = []
+    for original_title in titles:
+        if original_title in corrections:
+            record_llm_call(MODEL, lesson_name, cache_hit=True)
+        else:
+            with stage('check'):
+                corrections[original_title] = to_title_case_with_ollama_cli(original_title, lesson_name)
+        corrected_title = corrections[original_title]
+
+        if original_title != corrected_title:
+            changed.append((original_title, corrected_title))
+    return changed
+
 def process_files(folder_path):
     """Process all files in the given folder."""
+    # Near-duplicate lessons share most headings, so corrections are cached
+    # per heading rather than asking the model again
+    corrections = {}
+
     with open('titles.csv', mode='w', newline='', encoding='utf-8') as csvfile:
         fieldnames = ['Lesson Name', 'Original Title', 'Corrected Title']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for filename in os.listdir(folder_path):
-            if filename.endswith('.html'):
-                lesson_path = os.path.join(folder_path, filename)
-                
-                with open(lesson_path, 'r', encoding='utf-8') as file:
-                    soup = BeautifulSoup(file, 'html.parser')
-                    lesson_name = os.path.splitext(filename)[0]
-                    writer.writerow({'Lesson Name': lesson_name, 'Original Title': '', 'Corrected Title': ''})
-
-                    for heading in range(1, 8):
-                        for tag in soup.find_all(f'h{heading}'):
-                            original_title = tag.get_text(strip=True)
-                            corrected_title = to_title_case_with_ollama_cli(original_title)
-
-                            if original_title != corrected_title:
-                                writer.writerow({
-                                    'Lesson Name': '',
-                                    'Original Title': original_title,
-                                    'Corrected Title': corrected_title
-                                })
+        for filename, html_content in iter_lessons(folder_path):
+            lesson_name = os.path.splitext(filename)[0]
+            changed = correct_lesson_titles(html_content, lesson_name, corrections)
+
+            with stage('write'):
+                writer.writerow({'Lesson Name': lesson_name, 'Original Title': '', 'Corrected Title': ''})
+                for original_title, corrected_title in changed:
+                    writer.writerow({
+                        'Lesson Name': '',
+                        'Original Title': original_title,
+                        'Corrected Title': corrected_title
+                    })
 
 def main():
     if len(sys.argv) != 2:
@@ -58,11 +116,12 @@ def main():
 
     folder_path = sys.argv[1]
     
-    if not os.path.isdir(folder_path):
-        print(f"Error: '{folder_path}' is not a valid directory.")
+    if not is_lesson_source(folder_path):
+        print(f"Error: '{folder_path}' is not a valid directory or scraper archive.")
         sys.exit(1)
 
     process_files(folder_path)
+    write_report('titles_llm_report')
     print("Title processing complete. Results saved in 'titles.csv'.")
 
 if __name__ == "__main__":
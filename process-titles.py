@@ -1,9 +1,10 @@
-import os
 import sys
 import csv
 import string
 import re
 from bs4 import BeautifulSoup
+from course_output import is_lesson_source, iter_lessons
+from profiling import stage
 
 # Lowercase exceptions: words that should be in lowercase unless they're the first/last word
 LOWERCASE_EXCEPTIONS = {
@@ -67,35 +68,38 @@ def process_files(folder_path):
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for filename in os.listdir(folder_path):
-            if filename.endswith('.html'):
-                lesson_path = os.path.join(folder_path, filename)
-                
-                with open(lesson_path, 'r', encoding='utf-8') as file:
-                    soup = BeautifulSoup(file, 'html.parser')
-                     # Get the title of the page from the <h1> tag
-                    h1_tag = soup.find('h1')
-                    page_title = h1_tag.get_text(strip=True) if h1_tag else 'No Title'
-
-                    lesson_name = h1_tag.get_text(strip=True) if h1_tag else 'No Title'
-                    writer.writerow({'Lesson Name': lesson_name, 'Original Title': '', 'Corrected Title': ''})
-
-                    for heading in range(1, 8):
-                        for tag in soup.find_all(f'h{heading}'):
-
-                            # Skip module heading
-                            if heading == 3 and 'wp-block-sensei-lms-course-theme-lesson-module' in tag.get('class', []):
-                                continue
-
-                            original_title = tag.get_text(strip=True)
-                            corrected_title = to_title_case(original_title)
-
-                            if original_title != corrected_title:
-                                writer.writerow({
-                                    'Lesson Name': '',
-                                    'Original Title': original_title,
-                                    'Corrected Title': corrected_title
-                                })
+        for filename, html_content in iter_lessons(folder_path):
+            with stage('parse'):
+                soup = BeautifulSoup(html_content, 'html.parser')
+            # Get the title of the page from the <h1> tag
+            h1_tag = soup.find('h1')
+            page_title = h1_tag.get_text(strip=True) if h1_tag else 'No Title'
+
+            lesson_name = h1_tag.get_text(strip=True) if h1_tag else 'No Title'
+            with stage('write'):
+                writer.writerow({'Lesson Name': lesson_name, 'Original Title': '', 'Corrected Title': ''})
+
+            for heading in range(1, 8):
+                with stage('extract'):
+                    tags = soup.find_all(f'h{heading}')
+                for tag in tags:
+
+                    # Skip module heading
+                    if heading == 3 and 'wp-block-sensei-lms-course-theme-lesson-module' in tag.get('class', []):
+                        continue
+
+                    with stage('extract'):
+                        original_title = tag.get_text(strip=True)
+                    with stage('check'):
+                        corrected_title = to_title_case(original_title)
+
+                    if original_title != corrected_title:
+                        with stage('write'):
+                            writer.writerow({
+                                'Lesson Name': '',
+                                'Original Title': original_title,
+                                'Corrected Title': corrected_title
+                            })
 
 def main():
     if len(sys.argv) != 2:
@@ -104,8 +108,8 @@ def main():
 
     folder_path = sys.argv[1]
     
-    if not os.path.isdir(folder_path):
-        print(f"Error: '{folder_path}' is not a valid directory.")
+    if not is_lesson_source(folder_path):
+        print(f"Error: '{folder_path}' is not a valid directory or scraper archive.")
         sys.exit(1)
 
     process_files(folder_path)
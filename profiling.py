@@ -0,0 +1,55 @@
+import os
+import json
+import time
+import atexit
+import cProfile
+from contextlib import contextmanager
+
+# Set SENSEI_PROFILE_DIR to profile the analysis tools stage by stage
+PROFILE_DIR = os.environ.get('SENSEI_PROFILE_DIR')
+
+_profiles = {}
+_seconds = {}
+_active = []
+
+def _dump():
+    """Write one cProfile file per stage plus the time spent in each stage."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    for name, profile in _profiles.items():
+        profile.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+    with open(os.path.join(PROFILE_DIR, 'stages.json'), 'w', encoding='utf-8') as file:
+        json.dump({name: round(seconds, 6) for name, seconds in _seconds.items()}, file, indent=2)
+
+@contextmanager
+def stage(name):
+    """Attribute the time and calls inside the block to a named stage (read, parse, extract, check, write).
+
+    Does nothing unless SENSEI_PROFILE_DIR is set. Stages can nest: only the
+    innermost stage is profiled, so each stage's time excludes the stages inside it.
+    """
+    if not PROFILE_DIR:
+        yield
+        return
+
+    if not _profiles:
+        atexit.register(_dump)
+    profile = _profiles.setdefault(name, cProfile.Profile())
+    now = time.perf_counter()
+    if _active:
+        parent_name, parent_started = _active[-1]
+        _profiles[parent_name].disable()
+        _seconds[parent_name] = _seconds.get(parent_name, 0.0) + now - parent_started
+
+    _active.append((name, now))
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _, started = _active.pop()
+        now = time.perf_counter()
+        _seconds[name] = _seconds.get(name, 0.0) + now - started
+        if _active:
+            parent_name, _ = _active.pop()
+            _active.append((parent_name, now))
+            _profiles[parent_name].enable()
@@ -0,0 +1,152 @@
+import time
+import logging
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+DIRECT = 'direct'
+DEFAULT_PROXIES = ['socks5://localhost:8080']
+
+# Health settings: how many recent results to judge a proxy on, and when to eject it
+HEALTH_WINDOW = 20
+MIN_SAMPLES = 5
+MAX_ERROR_RATE = 0.5
+MAX_CONSECUTIVE_ERRORS = 3
+EJECT_SECONDS = 30
+MAX_EJECT_SECONDS = 300
+REQUEST_TIMEOUT = 60
+
+class Proxy:
+    """One egress route with its own session, connection pool, concurrency limit and health stats."""
+
+    def __init__(self, url, concurrency):
+        self.url = url
+        self.concurrency = concurrency
+        self.slots = threading.Semaphore(concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if url != DIRECT:
+            self.session.proxies = {'http': url, 'https': url}
+
+        self.in_flight = 0
+        self.results = deque(maxlen=HEALTH_WINDOW)
+        self.latency = None
+        self.consecutive_errors = 0
+        self.backoff = 0
+        self.times_ejected = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def error_rate(self):
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def is_healthy(self, now):
+        return now >= self.ejected_until
+
+    def load(self):
+        """Sort key used to pick a proxy: share of busy slots, then typical latency.
+
+        Proxies that haven't been measured yet sort first on latency so they get tried.
+        """
+        return (self.in_flight / self.concurrency, self.latency or 0.0)
+
+class ProxyPool:
+    """Spread requests across a pool of proxies (or direct connections).
+
+    Behaves like a requests session for get(), so it can be passed anywhere
+    the scraper expects a session. Each request goes to the least loaded
+    healthy proxy; proxies that keep failing are ejected for a backoff
+    period and re-admitted automatically afterwards.
+    """
+
+    def __init__(self, proxy_urls=None, concurrency=1):
+        if concurrency < 1:
+            raise ValueError(f"Proxy concurrency must be at least 1, got {concurrency}")
+        self.proxies = [Proxy(url, concurrency) for url in (proxy_urls or DEFAULT_PROXIES)]
+        self.lock = threading.Lock()
+
+    @property
+    def concurrency(self):
+        """Total number of requests the pool can run at once."""
+        return sum(proxy.concurrency for proxy in self.proxies)
+
+    def pick_proxy(self, exclude=()):
+        """Choose the least loaded healthy proxy, re-admitting any whose ejection has expired."""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [proxy for proxy in self.proxies if proxy not in exclude] or self.proxies
+            healthy = [proxy for proxy in candidates if proxy.is_healthy(now)]
+            if healthy:
+                proxy = min(healthy, key=Proxy.load)
+            else:
+                # Everything is ejected: use the proxy that is due back soonest rather than fail
+                proxy = min(candidates, key=lambda proxy: proxy.ejected_until)
+            if proxy.ejected_until and proxy.ejected_until <= now:
+                logging.info(f"Re-admitting proxy {proxy.url}")
+                proxy.ejected_until = 0.0
+                proxy.results.clear()
+                proxy.consecutive_errors = 0
+            proxy.in_flight += 1
+            return proxy
+
+    def record_result(self, proxy, ok, latency):
+        """Update a proxy's health stats and eject it if it's failing."""
+        with self.lock:
+            proxy.in_flight -= 1
+            proxy.requests += 1
+            proxy.results.append(ok)
+            if ok:
+                proxy.consecutive_errors = 0
+                proxy.backoff = 0
+                # Exponentially weighted latency so recent requests count most
+                proxy.latency = latency if proxy.latency is None else 0.8 * proxy.latency + 0.2 * latency
+                return
+
+            proxy.errors += 1
+            proxy.consecutive_errors += 1
+            failing = (proxy.consecutive_errors >= MAX_CONSECUTIVE_ERRORS
+                       or len(proxy.results) >= MIN_SAMPLES and proxy.error_rate() > MAX_ERROR_RATE)
+            if failing and proxy.is_healthy(time.monotonic()):
+                eject_seconds = min(EJECT_SECONDS * 2 ** proxy.backoff, MAX_EJECT_SECONDS)
+                proxy.backoff += 1
+                proxy.times_ejected += 1
+                proxy.ejected_until = time.monotonic() + eject_seconds
+                logging.warning(f"Ejecting proxy {proxy.url} for {eject_seconds}s "
+                                f"(error rate {proxy.error_rate():.0%}, {proxy.consecutive_errors} errors in a row)")
+
+    def get(self, url, **kwargs):
+        """GET a URL through the pool, retrying connection failures on other proxies."""
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        tried = []
+        while True:
+            proxy = self.pick_proxy(exclude=tried)
+            tried.append(proxy)
+            with proxy.slots:
+                # Time the request itself, not the wait for a free slot
+                started = time.monotonic()
+                try:
+                    response = proxy.session.get(url, **kwargs)
+                except requests.RequestException:
+                    self.record_result(proxy, False, time.monotonic() - started)
+                    if len(tried) >= len(self.proxies):
+                        raise
+                    logging.warning(f"Request to {url} via {proxy.url} failed, retrying on another proxy")
+                    continue
+
+            # Rate limiting and server errors count against the route too
+            self.record_result(proxy, response.status_code < 500 and response.status_code != 429,
+                               time.monotonic() - started)
+            return response
+
+    def log_stats(self):
+        """Log request counts, error rates and latency for every proxy."""
+        for proxy in self.proxies:
+            latency = f"{proxy.latency:.2f}s" if proxy.latency is not None else "n/a"
+            logging.info(f"Proxy {proxy.url}: {proxy.requests} requests, {proxy.errors} errors, "
+                         f"latency {latency}, ejected {proxy.times_ejected} times")
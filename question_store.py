@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import hashlib
+from datetime import datetime, timezone
+from typing import List
+from pydantic import BaseModel
+
+# Define the structure of the question schema
+class QuestionOption(BaseModel):
+    text: str
+    correct: bool
+
+class Question(BaseModel):
+    question: str
+    options: List[QuestionOption]
+    answer_explanation: str
+
+class QuestionSchema(BaseModel):
+    questions: List[Question]
+
+question_schema = QuestionSchema.model_json_schema()
+
+def content_hash(text):
+    """Return a stable hash for a piece of text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+QUESTIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY,
+        course TEXT NOT NULL,
+        lesson TEXT NOT NULL,
+        lesson_title TEXT NOT NULL,
+        module TEXT NOT NULL,
+        model TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        question_hash TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        question_json TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        UNIQUE (course, lesson, model, question_hash)
+    )
+"""
+
+def open_question_store(db_path):
+    """Open (and create if needed) the SQLite question bank."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    # Stores from before questions were keyed by course get their rows moved over with an empty course
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(questions)")]
+    if columns and 'course' not in columns:
+        with conn:
+            conn.execute("ALTER TABLE questions RENAME TO questions_without_course")
+            conn.execute(QUESTIONS_TABLE)
+            conn.execute(
+                "INSERT INTO questions (course, lesson, lesson_title, module, model, content_hash, question_hash, position, question_json, created_at) "
+                "SELECT '', lesson, lesson_title, module, model, content_hash, question_hash, position, question_json, created_at "
+                "FROM questions_without_course"
+            )
+            conn.execute("DROP TABLE questions_without_course")
+
+    conn.executescript(QUESTIONS_TABLE + """;
+        CREATE INDEX IF NOT EXISTS idx_questions_lesson ON questions (course, lesson);
+        CREATE INDEX IF NOT EXISTS idx_questions_module ON questions (module);
+        CREATE INDEX IF NOT EXISTS idx_questions_model ON questions (model);
+        CREATE INDEX IF NOT EXISTS idx_questions_content_hash ON questions (content_hash);
+    """)
+    return conn
+
+def has_current_questions(conn, course, lesson, model, content):
+    """Check whether a course's lesson already has questions from this model for its current content."""
+    return conn.execute(
+        "SELECT 1 FROM questions WHERE course = ? AND lesson = ? AND model = ? AND content_hash = ? LIMIT 1",
+        (course, lesson, model, content_hash(content))
+    ).fetchone() is not None
+
+def save_questions(conn, course, lesson, lesson_title, module, model, content, questions):
+    """Validate generated questions and store them as the lesson's questions for this model.
+
+    Lesson names like 01_01_introduction repeat across courses, so lessons are
+    keyed by course too. Questions stored earlier for the same course, lesson
+    and model are replaced, so re-running generation doesn't pile up extra
+    sets. Raises pydantic's ValidationError if the questions don't match the
+    schema. Returns the number of questions saved.
+    """
+    validated = QuestionSchema.model_validate({"questions": questions})
+    created_at = datetime.now(timezone.utc).isoformat()
+    lesson_hash = content_hash(content)
+
+    saved = 0
+    with conn:
+        conn.execute("DELETE FROM questions WHERE course = ? AND lesson = ? AND model = ?", (course, lesson, model))
+        for position, question in enumerate(validated.questions, 1):
+            question_json = question.model_dump_json()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO questions "
+                "(course, lesson, lesson_title, module, model, content_hash, question_hash, position, question_json, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (course, lesson, lesson_title, module, model, lesson_hash,
+                 content_hash(question_json), position, question_json, created_at)
+            )
+            saved += cursor.rowcount
+    return saved
+
+def get_questions(conn, course=None, lesson=None, module=None, model=None):
+    """Return stored question rows, optionally filtered by course, lesson, module or model."""
+    query = "SELECT * FROM questions"
+    filters = []
+    params = []
+    for column, value in (("course", course), ("lesson", lesson), ("module", module), ("model", model)):
+        if value is not None:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    query += " ORDER BY course, module, lesson, created_at, position"
+    return conn.execute(query, params)
+
+def load_questions(conn, course, lesson, model=None):
+    """Return the stored questions for a course's lesson as plain dicts."""
+    return [json.loads(row['question_json']) for row in get_questions(conn, course=course, lesson=lesson, model=model)]
+
+def format_question_to_markdown(question_data):
+    """Format the question and answers into markdown format."""
+    markdown = f"**Question:** {question_data['question']}\n\n"
+    markdown += "**Options:**\n"
+    for idx, option in enumerate(question_data['options'], 1):
+        markdown += f"- {chr(64 + idx)}. {option['text']}\n"
+
+    # Find the correct answer safely
+    try:
+        correct_idx = next(idx for idx, option in enumerate(question_data['options'], 1) if option['correct'])
+        correct_label = chr(64 + correct_idx)
+    except StopIteration:
+        correct_label = "N/A"  # No correct answer provided
+
+    markdown += f"\n**Correct Answer:** {correct_label}\n"
+    markdown += f"\n**Explanation:** {question_data.get('answer_explanation', 'No explanation provided.')}\n"
+    return markdown
+
+def group_questions_by_lesson(rows):
+    """Group question rows into (lesson, lesson_title, questions) in query order."""
+    lessons = {}
+    for row in rows:
+        if row['lesson'] not in lessons:
+            lessons[row['lesson']] = (row['lesson_title'], [])
+        lessons[row['lesson']][1].append(json.loads(row['question_json']))
+    return [(lesson, title, questions) for lesson, (title, questions) in lessons.items()]
+
+def distinct_values(conn, column):
+    """Return the distinct values of a questions column, e.g. every course or model in the store."""
+    return [row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM questions ORDER BY {column}")]
+
+def export_questions(conn, export_folder_path, course, model, module=None):
+    """Render one course's questions from one model as one markdown and one JSON file per lesson."""
+    os.makedirs(export_folder_path, exist_ok=True)
+
+    exported = 0
+    for lesson, lesson_title, questions in group_questions_by_lesson(get_questions(conn, course=course, module=module, model=model)):
+        markdown_path = os.path.join(export_folder_path, lesson + '.md')
+        with open(markdown_path, 'w', encoding='utf-8') as md_file:
+            md_file.write(f"# Questions for: {lesson_title}\n\n")
+            for idx, question_data in enumerate(questions, 1):
+                md_file.write(f"## Question {idx}\n\n")
+                md_file.write(format_question_to_markdown(question_data))
+
+        json_path = os.path.join(export_folder_path, lesson + '.json')
+        with open(json_path, 'w', encoding='utf-8') as json_file:
+            json.dump({"questions": questions}, json_file, indent=2)
+
+        exported += 1
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description="Export stored questions as markdown and JSON, one file of each per lesson.")
+    parser.add_argument("store", help="question store, e.g. questions.db")
+    parser.add_argument("export_folder_path", help="folder to write the lesson files to")
+    parser.add_argument("module", nargs="?", help="only export this module")
+    parser.add_argument("--course", help="course to export (required if the store holds more than one)")
+    parser.add_argument("--model", help="model whose questions to export (required if the store holds more than one)")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.store):
+        print(f"Error: '{args.store}' is not a valid question store.")
+        sys.exit(1)
+
+    conn = open_question_store(args.store)
+
+    # Lesson names repeat across courses and every model has its own questions, so export one of each
+    selected = {}
+    for column in ('course', 'model'):
+        selected[column] = getattr(args, column)
+        if selected[column] is None:
+            values = distinct_values(conn, column)
+            if len(values) > 1:
+                print(f"Error: '{args.store}' holds questions for more than one {column}, pick one with --{column}: {', '.join(values)}")
+                sys.exit(1)
+            selected[column] = values[0] if values else ''
+
+    exported = export_questions(conn, args.export_folder_path, selected['course'], selected['model'], args.module)
+    print(f"Exported questions for {exported} lessons to {args.export_folder_path}")
+
+if __name__ == "__main__":
+    main()
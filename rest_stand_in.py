@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import filecmp
+import tempfile
+import threading
+import subprocess
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Like Sensei LMS, the module taxonomy's rest_base names both its terms route and the field on lessons
+MODULE_REST_BASE = 'modules'
+NONCE = '0a1b2c3d4e'
+MAX_PER_PAGE = 100
+
+def build_course(lesson_count=230):
+    """Build a stand-in course: three modules, one lesson the API doesn't return
+    and one the API returns without its module."""
+    modules = {
+        21: "Getting Started &amp; Setup",
+        22: "Queries, Caching &#8211; Performance",
+        23: "Shipping",
+    }
+    lessons = []
+    for number in range(1, lesson_count + 1):
+        module_id = 21 + (number - 1) * len(modules) // lesson_count
+        lessons.append({
+            "id": 1000 + number,
+            "slug": f"lesson-{number}",
+            "title": {"rendered": f"Lesson {number}: Hooks &amp; Filters"},
+            "content": {"rendered": (
+                f'<h2 class="wp-block-heading">Part {number}</h2><p>Body of lesson {number} with <a href="/x/">a link</a>.</p>'
+                f'<ul><li>One</li><li>Two</li></ul>'
+                f'<div class="wp-block-sensei-lms-lesson-actions"><button>Complete lesson</button></div>'
+            )},
+            MODULE_REST_BASE: [module_id],
+            "in_api": number != 7,
+        })
+    # Returned by the API, but without its module terms
+    lessons[11][MODULE_REST_BASE] = []
+    lessons[11]["html_module"] = modules[21 + 11 * len(modules) // lesson_count]
+    return modules, lessons
+
+def lesson_page(lesson, modules):
+    """Render a lesson the way the Sensei course theme does."""
+    module_name = lesson.get("html_module") or modules[lesson[MODULE_REST_BASE][0]]
+    return (
+        '<html><head><title>Lesson</title></head><body>'
+        f'<h3 class="wp-block-sensei-lms-course-theme-lesson-module">{module_name}</h3>'
+        f'<h1 class="wp-block-post-title">{lesson["title"]["rendered"]}</h1>'
+        f'<div class="sensei-course-theme__main-content">{lesson["content"]["rendered"]}</div>'
+        '<div class="wp-block-sensei-lms-course-theme-prev-next-lesson"><a href="#">Next</a></div>'
+        '</body></html>'
+    )
+
+def only_fields(item, fields):
+    """Apply the REST API's _fields parameter."""
+    if not fields:
+        return item
+    wanted = fields.split(',')
+    return {key: value for key, value in item.items() if key in wanted}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve a course page, lesson pages and the lessons and modules REST endpoints."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        modules, lessons = self.server.modules, self.server.lessons
+        self.server.requests.append(url.path)
+
+        if url.path == '/course/':
+            links = ''.join(
+                f'<li><a class="wp-block-sensei-lms-course-outline-lesson" href="/lesson/{lesson["slug"]}/">{lesson["title"]["rendered"]}</a></li>'
+                for lesson in lessons
+            )
+            self.respond('text/html', '<html><head><title>Stand-in Course</title>'
+                         f'<script>wp.apiFetch.use( wp.apiFetch.createNonceMiddleware( "{NONCE}" ) );</script>'
+                         f'</head><body><ul>{links}</ul></body></html>')
+        elif url.path.startswith('/lesson/'):
+            slug = url.path.strip('/').split('/')[-1]
+            lesson = next((lesson for lesson in lessons if lesson["slug"] == slug), None)
+            if lesson is None:
+                self.send_error(404)
+            else:
+                self.respond('text/html', lesson_page(lesson, modules))
+        elif url.path.startswith('/wp-json/'):
+            # Cookie authentication only counts with the nonce
+            if self.headers.get('X-WP-Nonce') != NONCE:
+                self.respond('application/json', json.dumps({"code": "rest_forbidden"}), 401)
+            elif int(query.get('per_page', 10)) > MAX_PER_PAGE:
+                self.respond('application/json', json.dumps({"code": "rest_invalid_param"}), 400)
+            elif url.path == '/wp-json/wp/v2/lessons':
+                slugs = query.get('slug', '').split(',')
+                found = [
+                    only_fields({key: value for key, value in lesson.items() if key not in ('in_api', 'html_module')}, query.get('_fields'))
+                    for lesson in lessons if lesson["in_api"] and lesson["slug"] in slugs
+                ]
+                self.respond('application/json', json.dumps(found[:int(query.get('per_page', 10))]))
+            elif url.path == f'/wp-json/wp/v2/{MODULE_REST_BASE}':
+                ids = [int(module_id) for module_id in query.get('include', '').split(',') if module_id]
+                found = [only_fields({"id": module_id, "name": modules[module_id]}, query.get('_fields')) for module_id in ids if module_id in modules]
+                self.respond('application/json', json.dumps(found))
+            else:
+                self.respond('application/json', json.dumps({"code": "rest_no_route"}), 404)
+        else:
+            self.send_error(404)
+
+    def respond(self, content_type, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+def start_stand_in_server(lesson_count=230):
+    """Start the stand-in site in a background thread and return it."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    server.modules, server.lessons = build_course(lesson_count)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def scrape(url, fetch_mode, folder):
+    """Run course-scraper-2.py against the stand-in from its own working folder."""
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'cookies.txt'), 'w') as file:
+        file.write('wordpress_logged_in_stand_in=1')
+    scraper = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'course-scraper-2.py')
+    subprocess.run([sys.executable, scraper, url, '--fetch-mode', fetch_mode, '--proxy', 'direct'],
+                   cwd=folder, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def differing_files(html_folder, rest_folder):
+    """Compare two scraper output folders and return the paths that differ or exist in only one."""
+    comparison = filecmp.dircmp(html_folder, rest_folder)
+    differences = []
+
+    def collect(comparison, prefix):
+        differences.extend(prefix + name for name in comparison.left_only + comparison.right_only + comparison.funny_files)
+        differences.extend(prefix + name for name in comparison.common_files
+                           if not filecmp.cmp(os.path.join(comparison.left, name), os.path.join(comparison.right, name), shallow=False))
+        for name, sub_comparison in comparison.subdirs.items():
+            collect(sub_comparison, prefix + name + '/')
+
+    collect(comparison, '')
+    return sorted(differences)
+
+def main():
+    if len(sys.argv) > 2:
+        print("Usage: python rest_stand_in.py [lesson_count]")
+        sys.exit(1)
+    lesson_count = int(sys.argv[1]) if len(sys.argv) == 2 else 230
+
+    server = start_stand_in_server(lesson_count)
+    url = f"http://127.0.0.1:{server.server_address[1]}/course/"
+    with tempfile.TemporaryDirectory() as folder:
+        scrape(url, 'html', os.path.join(folder, 'html'))
+        html_requests = len(server.requests)
+        scrape(url, 'rest', os.path.join(folder, 'rest'))
+        rest_requests = server.requests[html_requests:]
+
+        output_folder = 'output-stand-in-course'
+        differences = differing_files(os.path.join(folder, 'html', output_folder), os.path.join(folder, 'rest', output_folder))
+    server.shutdown()
+
+    api_requests = sum(1 for path in rest_requests if path.startswith('/wp-json/'))
+    page_requests = sum(1 for path in rest_requests if path.startswith('/lesson/'))
+    print(f"html mode: {html_requests} requests")
+    print(f"rest mode: {len(rest_requests)} requests ({api_requests} REST API, {page_requests} lesson page fallbacks)")
+
+    # Only the lesson missing from the API and the one without its module should need their page
+    expected_fallbacks = sum(1 for lesson in server.lessons if not lesson["in_api"] or not lesson[MODULE_REST_BASE])
+    if differences or page_requests != expected_fallbacks:
+        for path in differences[:20]:
+            print(f"Differs: {path}")
+        if len(differences) > 20:
+            print(f"... and {len(differences) - 20} more files differ")
+        if page_requests != expected_fallbacks:
+            print(f"Expected {expected_fallbacks} lesson page fallbacks, got {page_requests}.")
+        print("REST mode doesn't match the HTML scrape.")
+        sys.exit(1)
+    print("REST mode output matches the HTML scrape.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import subprocess
+import importlib.util
+
+# Subcommand -> (script, description). Scripts are only imported when their
+# subcommand runs, so a quick check doesn't pay for bs4, pydantic, ollama or openai.
+SUBCOMMANDS = {
+    'scrape': ('course-scraper-2.py', "Scrape a course into lesson, module and combined HTML"),
+    'grammar': ('course_grammar.py', "Check lesson punctuation and heading case"),
+    'titles': ('process-titles.py', "Audit heading title case with the built-in rules"),
+    'titles-llm': ('process-titles-with-ollama.py', "Audit heading title case with Ollama"),
+    'questions': ('course-questions.py', "Generate quiz questions with Ollama"),
+    'questions-chatgpt': ('course_questions_chatgpt.py', "Generate quiz questions with ChatGPT"),
+    'export-questions': ('question_store.py', "Export the question bank as markdown and JSON"),
+    'duplicates': ('lesson_similarity.py', "Report near-duplicate lessons"),
+    'snapshot': ('snapshot_store.py', "List and diff scrape snapshots"),
+    'search': ('lesson_search.py', "Index and search lesson text"),
+    'queue': ('work_queue.py', "Distribute work across workers through a shared queue"),
+    'benchmark': ('benchmark.py', "Benchmark the analysis tools on a synthetic course"),
+}
+
+def load_script(filename):
+    """Import one of the top-level scripts (which can't be imported by name) as a module."""
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        # Don't leave a half-initialised module behind for the next caller
+        del sys.modules[name]
+        raise
+    return module
+
+def print_usage():
+    print("Usage: python sensei.py <command> [args...]")
+    print("       python sensei.py startup-times")
+    print()
+    for command, (_, description) in SUBCOMMANDS.items():
+        print(f"  {command:<18} {description}")
+
+def measure_startup_times():
+    """Time a cold start of each subcommand (interpreter start plus its imports) in a fresh process."""
+    def cold_start(*args):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return (time.perf_counter() - started) * 1000
+
+    interpreter = cold_start('-c', 'pass')
+    print(f"{'interpreter':<18} {interpreter:7.0f} ms")
+    for command in SUBCOMMANDS:
+        try:
+            elapsed = cold_start(os.path.abspath(__file__), '--import-only', command)
+            print(f"{command:<18} {elapsed:7.0f} ms")
+        except subprocess.CalledProcessError:
+            print(f"{command:<18}   (import failed, missing dependency?)")
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print_usage()
+        sys.exit(0 if len(sys.argv) >= 2 else 1)
+
+    if sys.argv[1] == 'startup-times':
+        measure_startup_times()
+        return
+
+    # Used by startup-times: load a subcommand's imports without running it
+    if sys.argv[1] == '--import-only':
+        load_script(SUBCOMMANDS[sys.argv[2]][0])
+        return
+
+    command = sys.argv[1]
+    if command not in SUBCOMMANDS:
+        print(f"Error: unknown command '{command}'.")
+        print_usage()
+        sys.exit(1)
+
+    module = load_script(SUBCOMMANDS[command][0])
+    sys.argv = [f"sensei.py {command}"] + sys.argv[2:]
+    module.main()
+
+if __name__ == "__main__":
+    main()
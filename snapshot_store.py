@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import zlib
+import difflib
+import hashlib
+import logging
+from datetime import datetime, timezone
+from bs4 import BeautifulSoup
+from course_html import lesson_content, module_html, all_modules_html
+
+SNAPSHOT_STORE = 'snapshots'
+
+def object_path(store_path, content_hash):
+    """Path of a stored object, fanned out by the first two hash characters."""
+    return os.path.join(store_path, 'objects', content_hash[:2], content_hash)
+
+def write_object(store_path, content):
+    """Store content under its hash, skipping it if the store already has it."""
+    data = content.encode('utf-8')
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = object_path(store_path, content_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so an interrupted scrape never leaves a partial object
+        with open(path + '.tmp', 'wb') as file:
+            file.write(zlib.compress(data))
+        os.replace(path + '.tmp', path)
+    return content_hash
+
+def read_object(store_path, content_hash):
+    """Read stored content back by its hash."""
+    with open(object_path(store_path, content_hash), 'rb') as file:
+        return zlib.decompress(file.read()).decode('utf-8')
+
+class SnapshotOutput:
+    """Write scraper output as a snapshot in a content-addressed store.
+
+    File contents go into the shared object store, so lessons that haven't
+    changed since an earlier snapshot cost no extra disk. The snapshot itself
+    is a small JSON file mapping each output path to its content hash.
+
+    Module files and all_modules.html are built from the lessons, so they
+    aren't stored: the snapshot only lists them under "derived" and they are
+    rebuilt from the lessons and the manifest when read.
+    """
+
+    def __init__(self, folder_title, store_path=SNAPSHOT_STORE):
+        self.store_path = store_path
+        created_at = datetime.now(timezone.utc)
+        self.snapshot = {"course": folder_title, "created_at": created_at.isoformat(), "files": {}, "derived": []}
+        self.snapshot_id = created_at.strftime('%Y%m%dT%H%M%SZ')
+        self.path = os.path.join(store_path, 'snapshots', folder_title, self.snapshot_id + '.snapshot')
+
+    def write(self, relative_path, content):
+        # Top-level HTML files are the module files and all_modules.html
+        if '/' not in relative_path and relative_path.endswith('.html'):
+            self.snapshot["derived"].append(relative_path)
+        else:
+            self.snapshot["files"][relative_path] = write_object(self.store_path, content)
+        return f"{self.path}:{relative_path}"
+
+    def close(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Snapshot IDs only go down to the second, so number any later scrape of the same second
+        folder = os.path.dirname(self.path)
+        number = 1
+        while True:
+            try:
+                file = open(self.path, 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                number += 1
+                self.path = os.path.join(folder, f"{self.snapshot_id}-{number}.snapshot")
+        with file:
+            json.dump(self.snapshot, file, indent=2)
+        logging.info(f"Snapshot saved to {self.path}")
+
+def snapshot_store_path(snapshot_path):
+    """Find the store a snapshot file belongs to (<store>/snapshots/<course>/<id>.snapshot)."""
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(snapshot_path))))
+
+def load_snapshot(snapshot_path):
+    """Load a snapshot's path to hash mapping."""
+    with open(snapshot_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def snapshot_paths(snapshot):
+    """Every output path of a snapshot, stored or derived."""
+    return list(snapshot["files"]) + snapshot.get("derived", [])
+
+def read_snapshot_file(snapshot_path, relative_path, snapshot=None):
+    """Read one file of a snapshot from the object store, rebuilding it if it's a derived file."""
+    snapshot = snapshot or load_snapshot(snapshot_path)
+    if relative_path in snapshot.get("derived", []):
+        return rebuild_derived_file(snapshot_path, relative_path, snapshot)
+    return read_object(snapshot_store_path(snapshot_path), snapshot["files"][relative_path])
+
+def rebuild_derived_file(snapshot_path, relative_path, snapshot):
+    """Rebuild a module file or all_modules.html from the snapshot's lessons, in manifest order."""
+    store_path = snapshot_store_path(snapshot_path)
+    manifest = json.loads(read_object(store_path, snapshot["files"]["manifest.json"]))
+
+    def module_lessons(module):
+        return [
+            (lesson["title"], lesson_content(read_object(store_path, snapshot["files"][lesson["path"]]), lesson["title"]))
+            for lesson in module["lessons"]
+        ]
+
+    if relative_path == 'all_modules.html':
+        return all_modules_html((module["name"], module_lessons(module)) for module in manifest["modules"])
+    for module in manifest["modules"]:
+        if module["path"] == relative_path:
+            return module_html(module["name"], module_lessons(module))
+    raise FileNotFoundError(f"'{relative_path}' isn't in the manifest of '{snapshot_path}'")
+
+def snapshot_order(filename):
+    """Sort key putting numbered snapshots (<id>-2.snapshot) after the first one of the same second."""
+    snapshot_id, _, number = filename[:-len('.snapshot')].partition('-')
+    return snapshot_id, int(number or 1)
+
+def list_snapshots(store_path=SNAPSHOT_STORE):
+    """Return every snapshot file in the store, oldest first per course."""
+    snapshots_folder = os.path.join(store_path, 'snapshots')
+    if not os.path.isdir(snapshots_folder):
+        return []
+    return [
+        os.path.join(snapshots_folder, course, filename)
+        for course in sorted(os.listdir(snapshots_folder))
+        for filename in sorted((name for name in os.listdir(os.path.join(snapshots_folder, course)) if name.endswith('.snapshot')),
+                               key=snapshot_order)
+    ]
+
+def snapshot_lessons(snapshot_path, snapshot):
+    """Map each lesson of a snapshot to its (path, hash), keyed by the lesson URL from the manifest.
+
+    Lesson paths are numbered by position in the course, so a lesson added
+    early in a module or a retitled lesson moves every later path. The URL
+    doesn't, so it's what lessons are matched by. Snapshots without a
+    manifest fall back to the path.
+    """
+    lessons = {path: (path, content_hash) for path, content_hash in snapshot["files"].items() if path.startswith('lessons/')}
+    if "manifest.json" not in snapshot["files"]:
+        return lessons
+    manifest = json.loads(read_object(snapshot_store_path(snapshot_path), snapshot["files"]["manifest.json"]))
+    return {
+        lesson["url"]: lessons[lesson["path"]]
+        for module in manifest["modules"]
+        for lesson in module["lessons"]
+        if lesson["path"] in lessons
+    }
+
+def diff_snapshots(old_path, new_path):
+    """Compare the lessons of two snapshots, matching lessons by URL.
+
+    Returns (added, removed, moved, changed): added and removed are lists of
+    lesson paths, moved lists the (old_path, new_path) of lessons whose path
+    changed but whose content didn't, and changed lists the (old_path, new_path)
+    of lessons whose content changed, whether or not they moved.
+    """
+    old_lessons = snapshot_lessons(old_path, load_snapshot(old_path))
+    new_lessons = snapshot_lessons(new_path, load_snapshot(new_path))
+
+    added = sorted(new_lessons[key][0] for key in set(new_lessons) - set(old_lessons))
+    removed = sorted(old_lessons[key][0] for key in set(old_lessons) - set(new_lessons))
+    moved = []
+    changed = []
+    for key in set(old_lessons) & set(new_lessons):
+        (old_lesson_path, old_hash), (new_lesson_path, new_hash) = old_lessons[key], new_lessons[key]
+        if old_hash != new_hash:
+            changed.append((old_lesson_path, new_lesson_path))
+        elif old_lesson_path != new_lesson_path:
+            moved.append((old_lesson_path, new_lesson_path))
+    return added, removed, sorted(moved), sorted(changed)
+
+def html_diff(old_content, new_content, old_label, new_label):
+    """Render a side-by-side HTML diff of two lessons, one tag per line."""
+    old_lines = BeautifulSoup(old_content, 'html.parser').prettify().splitlines()
+    new_lines = BeautifulSoup(new_content, 'html.parser').prettify().splitlines()
+    return difflib.HtmlDiff(wrapcolumn=100).make_file(old_lines, new_lines, old_label, new_label, context=True)
+
+def write_html_diffs(old_path, new_path, changed, diff_folder_path):
+    """Write an HTML diff for each changed lesson, named after its new path."""
+    os.makedirs(diff_folder_path, exist_ok=True)
+    old_snapshot = load_snapshot(old_path)
+    new_snapshot = load_snapshot(new_path)
+
+    for old_lesson_path, new_lesson_path in changed:
+        old_content = read_snapshot_file(old_path, old_lesson_path, old_snapshot)
+        new_content = read_snapshot_file(new_path, new_lesson_path, new_snapshot)
+        filename = os.path.join(diff_folder_path, os.path.basename(new_lesson_path))
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(html_diff(old_content, new_content, old_snapshot["created_at"], new_snapshot["created_at"]))
+        print(f"Diff saved to {filename}")
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == 'list' and len(sys.argv) <= 3:
+        store_path = sys.argv[2] if len(sys.argv) == 3 else SNAPSHOT_STORE
+        for snapshot_path in list_snapshots(store_path):
+            print(snapshot_path)
+        return
+
+    if len(sys.argv) in (4, 5) and sys.argv[1] == 'diff':
+        old_path, new_path = sys.argv[2], sys.argv[3]
+        diff_folder_path = sys.argv[4] if len(sys.argv) == 5 else 'snapshot-diff'
+
+        for snapshot_path in (old_path, new_path):
+            if not os.path.isfile(snapshot_path):
+                print(f"Error: '{snapshot_path}' is not a valid snapshot.")
+                sys.exit(1)
+
+        added, removed, moved, changed = diff_snapshots(old_path, new_path)
+        for label, lesson_paths in (("Added", added), ("Removed", removed)):
+            for lesson_path in lesson_paths:
+                print(f"{label}: {lesson_path}")
+        for label, lesson_paths in (("Moved", moved), ("Changed", changed)):
+            for old_lesson_path, new_lesson_path in lesson_paths:
+                print(f"{label}: {old_lesson_path}" + (f" -> {new_lesson_path}" if new_lesson_path != old_lesson_path else ""))
+        print(f"{len(added)} added, {len(removed)} removed, {len(moved)} moved, {len(changed)} changed.")
+
+        if changed:
+            write_html_diffs(old_path, new_path, changed, diff_folder_path)
+        return
+
+    print("Usage: python snapshot_store.py list [store_path]")
+    print("       python snapshot_store.py diff <old.snapshot> <new.snapshot> [diff_folder_path]")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import os
+import sys
+import csv
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from course_output import OUTPUT_FORMATS, course_name, is_lesson_source, iter_lessons, module_for_lesson, module_map, open_output, output_path, read_lesson
+from llm_metrics import llm_calls, write_report
+from sensei import load_script
+
+# Lease settings: a task whose worker stops heartbeating is handed out again
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5
+
+TASK_KINDS = ('fetch_lesson', 'generate_questions', 'audit_titles')
+
+def open_queue(db_path):
+    """Open (and create if needed) the shared SQLite work queue.
+
+    The default rollback journal is used rather than WAL, since WAL
+    doesn't work when the database sits on shared network storage.
+    """
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+        CREATE INDEX IF NOT EXISTS idx_tasks_kind ON tasks (kind, status);
+    """)
+    return conn
+
+def enqueue(conn, kind, payloads):
+    """Add one task of the given kind per payload."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "INSERT INTO tasks (kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [(kind, json.dumps(payload), now, now) for payload in payloads]
+    )
+    conn.execute("COMMIT")
+    logging.info(f"Queued {len(payloads)} {kind} tasks")
+
+def claim_task(conn, worker, kinds=TASK_KINDS, lease_seconds=LEASE_SECONDS):
+    """Lease the next queued task, or one whose lease has expired.
+
+    Tasks that have already used up MAX_ATTEMPTS are marked failed instead.
+    """
+    placeholders = ','.join('?' for _ in kinds)
+    while True:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            f"SELECT * FROM tasks WHERE kind IN ({placeholders}) AND "
+            "(status = 'queued' OR (status = 'leased' AND lease_expires < ?)) ORDER BY id LIMIT 1",
+            (*kinds, now)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        if row['attempts'] >= MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', worker = NULL, updated_at = ?, "
+                "error = COALESCE(error, 'lease expired') WHERE id = ?",
+                (now, row['id'])
+            )
+            conn.execute("COMMIT")
+            continue
+
+        if row['status'] == 'leased':
+            logging.warning(f"Re-queuing task {row['id']} from expired worker {row['worker']}")
+        conn.execute(
+            "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+            "updated_at = ? WHERE id = ?",
+            (worker, now + lease_seconds, now, row['id'])
+        )
+        conn.execute("COMMIT")
+        return row
+
+def heartbeat(db_path, task_id, worker, lease_seconds, stop):
+    """Keep extending a task's lease until stop is set."""
+    conn = open_queue(db_path)
+    while not stop.wait(lease_seconds / 3):
+        conn.execute(
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, time.time(), task_id, worker)
+        )
+    conn.close()
+
+def finish_task(conn, task, worker, result=None, error=None):
+    """Store a task's result, or re-queue it after an error until it runs out of attempts.
+
+    Only the worker holding the lease can finish a task, so a worker that
+    lost its lease can't overwrite the result of the one that took over.
+    """
+    now = time.time()
+    if error is None:
+        status = 'done'
+    else:
+        # task is the row claim_task read, from before it counted this attempt
+        status = 'queued' if task['attempts'] + 1 < MAX_ATTEMPTS else 'failed'
+    conn.execute(
+        "UPDATE tasks SET status = ?, result = ?, error = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (status, json.dumps(result) if result is not None else None, error, now, task['id'], worker)
+    )
+
+def run_fetch_lesson(payload, context):
+    """Download and clean one lesson page."""
+    scraper = load_script('course-scraper-2.py')
+    if 'session' not in context:
+        context['cookie_header'] = scraper.get_cookie_header()
+        context['session'] = scraper.get_session_with_proxy(context['proxies'])
+    lesson_title, module_name, content = scraper.download_and_process_content(
+        context['session'], payload['url'], context['cookie_header']
+    )
+    return {"title": lesson_title, "module": module_name, "content": content}
+
+def run_generate_questions(payload, context):
+    """Generate questions for one lesson and return them for collect-questions to store.
+
+    Workers only read the question store, to skip lessons that are up to
+    date, so a busy store can't lose a finished answer.
+    """
+    # Imported here so fetch-only workers don't need pydantic
+    from bs4 import BeautifulSoup
+    from question_store import QuestionSchema, open_question_store, has_current_questions
+
+    generator = load_script('course_questions_chatgpt.py' if payload['generator'] == 'chatgpt' else 'course-questions.py')
+    html_content = read_lesson(payload['source'], payload['filename'])
+    soup = BeautifulSoup(html_content, 'html.parser')
+    content = soup.get_text(strip=True)
+    h1_tag = soup.find('h1')
+    lesson_title = h1_tag.get_text(strip=True) if h1_tag else payload['filename']
+    lesson_name = os.path.splitext(payload['filename'])[0]
+    course = course_name(payload['source'])
+
+    if os.path.isfile(payload['store']):
+        conn = open_question_store(payload['store'])
+        try:
+            if has_current_questions(conn, course, lesson_name, generator.MODEL, content):
+                return {"questions": None}
+        finally:
+            conn.close()
+
+    questions = generator.generate_questions_from_content(content, lesson_name)
+    if not questions:
+        raise ValueError(f"No questions generated for {lesson_name}")
+    # Fail the attempt here rather than at collect time if the answer doesn't match the schema
+    QuestionSchema.model_validate({"questions": questions})
+
+    # Workers run many tasks from the same source, so list its modules once
+    modules = context.setdefault('modules', {})
+    if payload['source'] not in modules:
+        modules[payload['source']] = module_map(payload['source'])
+    module = module_for_lesson(payload['filename'], modules[payload['source']])
+    return {"course": course, "lesson": lesson_name, "lesson_title": lesson_title, "module": module,
+            "model": generator.MODEL, "content": content, "questions": questions}
+
+def run_audit_titles(payload, context):
+    """Check the headings of one lesson with the Ollama title audit."""
+    titles = load_script('process-titles-with-ollama.py')
+    html_content = read_lesson(payload['source'], payload['filename'])
+    lesson_name = os.path.splitext(payload['filename'])[0]
+    corrections = titles.correct_lesson_titles(html_content, lesson_name, context.setdefault('corrections', {}))
+    return {"corrections": corrections}
+
+TASK_HANDLERS = {
+    'fetch_lesson': run_fetch_lesson,
+    'generate_questions': run_generate_questions,
+    'audit_titles': run_audit_titles,
+}
+
+def run_worker(db_path, kinds=TASK_KINDS, lease_seconds=LEASE_SECONDS, wait=False, proxies=None):
+    """Pull tasks from the queue until it's empty (or forever with wait)."""
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    conn = open_queue(db_path)
+    context = {'proxies': proxies}
+    completed = 0
+
+    logging.info(f"Worker {worker} started")
+    while True:
+        task = claim_task(conn, worker, kinds, lease_seconds)
+        if task is None:
+            if not wait:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(target=heartbeat, args=(db_path, task['id'], worker, lease_seconds, stop), daemon=True)
+        beat.start()
+        try:
+            result = TASK_HANDLERS[task['kind']](json.loads(task['payload']), context)
+            finish_task(conn, task, worker, result=result)
+            completed += 1
+            logging.info(f"Finished {task['kind']} task {task['id']}")
+        except Exception as e:
+            logging.error(f"{task['kind']} task {task['id']} failed: {e}")
+            finish_task(conn, task, worker, error=str(e))
+        finally:
+            stop.set()
+            beat.join()
+
+    logging.info(f"Worker {worker} finished {completed} tasks")
+    if llm_calls:
+        write_report(f"llm_report_{worker}")
+
+def enqueue_lessons(conn, course_urls, proxies=None):
+    """Read each course's lesson list and queue one fetch task per lesson."""
+    scraper = load_script('course-scraper-2.py')
+    cookie_header = scraper.get_cookie_header()
+    session = scraper.get_session_with_proxy(proxies)
+
+    for url in course_urls:
+        links = scraper.get_links_with_class(session, url, 'wp-block-sensei-lms-course-outline-lesson', cookie_header)
+        response = session.get(url, headers={'Cookie': cookie_header})
+        response.raise_for_status()
+        title = scraper.BeautifulSoup(response.text, 'html.parser').find('title').get_text(strip=True)
+        enqueue(conn, 'fetch_lesson', [
+            {"course_url": url, "course_title": title, "position": position, "url": link}
+            for position, link in enumerate(links)
+        ])
+
+def collect_lessons(conn, output_format):
+    """Assemble fetched lessons into course output, for courses whose lessons are all done."""
+    scraper = load_script('course-scraper-2.py')
+    courses = {}
+    for row in conn.execute("SELECT payload, status, result FROM tasks WHERE kind = 'fetch_lesson' ORDER BY id"):
+        payload = json.loads(row['payload'])
+        courses.setdefault(payload['course_url'], []).append((payload, row['status'], row['result']))
+
+    for url, tasks in courses.items():
+        failed = [payload['url'] for payload, status, _ in tasks if status == 'failed']
+        pending = [payload['url'] for payload, status, _ in tasks if status not in ('done', 'failed')]
+        if failed:
+            logging.warning(f"Skipping {url}: {len(failed)} lessons failed to fetch, queue them again with requeue-failed")
+            continue
+        if pending:
+            logging.warning(f"Skipping {url}: {len(pending)} lessons not fetched yet")
+            continue
+
+        tasks.sort(key=lambda task: task[0]['position'])
+        links = [payload['url'] for payload, _, _ in tasks]
+        lessons = {}
+        for payload, _, result in tasks:
+            lesson = json.loads(result)
+            lessons[payload['url']] = (lesson['title'], lesson['module'], lesson['content'])
+
+        course_title = tasks[0][0]['course_title']
+        output = open_output("output-" + scraper.sanitize_filename(course_title), output_format)
+        modules, lesson_paths = scraper.process_lessons(None, links, None, output, lessons)
+        scraper.save_course(modules, lesson_paths, course_title, url, output)
+        output.close()
+
+def collect_questions(conn):
+    """Save the questions of finished generation tasks into their question stores."""
+    from question_store import open_question_store, has_current_questions, save_questions
+
+    stores = {}
+    saved = 0
+    for row in conn.execute("SELECT payload, result FROM tasks WHERE kind = 'generate_questions' AND status = 'done' ORDER BY id"):
+        result = json.loads(row['result'])
+        if not result['questions']:
+            continue
+        store = json.loads(row['payload'])['store']
+        if store not in stores:
+            stores[store] = open_question_store(store)
+        store_conn = stores[store]
+        # Collecting again only saves lessons whose stored questions are out of date
+        if has_current_questions(store_conn, result['course'], result['lesson'], result['model'], result['content']):
+            continue
+        saved += save_questions(store_conn, result['course'], result['lesson'], result['lesson_title'],
+                                result['module'], result['model'], result['content'], result['questions'])
+
+    for store_conn in stores.values():
+        store_conn.close()
+    logging.info(f"Saved {saved} questions to {len(stores)} question stores")
+
+def requeue_failed(conn, kinds=TASK_KINDS):
+    """Give failed tasks a fresh set of attempts."""
+    placeholders = ','.join('?' for _ in kinds)
+    conn.execute("BEGIN IMMEDIATE")
+    cursor = conn.execute(
+        f"UPDATE tasks SET status = 'queued', attempts = 0, error = NULL, updated_at = ? "
+        f"WHERE status = 'failed' AND kind IN ({placeholders})",
+        (time.time(), *kinds)
+    )
+    conn.execute("COMMIT")
+    logging.info(f"Re-queued {cursor.rowcount} failed tasks")
+
+def collect_titles(conn, csv_path):
+    """Write finished title audits to a CSV in the same layout as process-titles-with-ollama.py."""
+    rows = conn.execute("SELECT payload, result FROM tasks WHERE kind = 'audit_titles' AND status = 'done'")
+    audits = sorted((json.loads(row['payload'])['filename'], json.loads(row['result'])) for row in rows)
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        fieldnames = ['Lesson Name', 'Original Title', 'Corrected Title']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for filename, result in audits:
+            writer.writerow({'Lesson Name': os.path.splitext(filename)[0], 'Original Title': '', 'Corrected Title': ''})
+            for original_title, corrected_title in result['corrections']:
+                writer.writerow({'Lesson Name': '', 'Original Title': original_title, 'Corrected Title': corrected_title})
+    logging.info(f"Title audit saved to {csv_path}")
+
+def print_status(conn):
+    """Print task counts by kind and status."""
+    for row in conn.execute("SELECT kind, status, COUNT(*) AS count FROM tasks GROUP BY kind, status ORDER BY kind, status"):
+        print(f"{row['kind']:<20} {row['status']:<8} {row['count']}")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s",
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="Split scraping and lesson analysis across workers sharing a SQLite queue.")
+    parser.add_argument("queue", help="path to the shared queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_lessons_parser = commands.add_parser("enqueue-lessons", help="queue a fetch task for every lesson of each course")
+    enqueue_lessons_parser.add_argument("urls", nargs="+", help="course homepage URLs")
+    enqueue_lessons_parser.add_argument("--proxy", action="append", dest="proxies", metavar="PROXY_URL")
+
+    enqueue_questions_parser = commands.add_parser("enqueue-questions", help="queue question generation for every lesson")
+    enqueue_questions_parser.add_argument("source", help="lesson folder or scraper archive")
+    enqueue_questions_parser.add_argument("--generator", choices=('ollama', 'chatgpt'), default="ollama")
+    enqueue_questions_parser.add_argument("--store", help="question store (default: questions.db beside the lessons)")
+
+    enqueue_titles_parser = commands.add_parser("enqueue-titles", help="queue a title audit for every lesson")
+    enqueue_titles_parser.add_argument("source", help="lesson folder or scraper archive")
+
+    worker_parser = commands.add_parser("worker", help="run tasks until the queue is empty")
+    worker_parser.add_argument("--kind", action="append", dest="kinds", choices=TASK_KINDS,
+                               help="only run these task kinds (default: all)")
+    worker_parser.add_argument("--lease", type=int, default=LEASE_SECONDS, help="lease length in seconds")
+    worker_parser.add_argument("--wait", action="store_true", help="keep polling for new tasks instead of exiting")
+    worker_parser.add_argument("--proxy", action="append", dest="proxies", metavar="PROXY_URL")
+
+    collect_lessons_parser = commands.add_parser("collect-lessons", help="save fetched courses as scraper output")
+    collect_lessons_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="dir")
+
+    commands.add_parser("collect-questions", help="save generated questions into their question stores")
+
+    collect_titles_parser = commands.add_parser("collect-titles", help="write finished title audits to a CSV")
+    collect_titles_parser.add_argument("--csv", default="titles.csv")
+
+    requeue_failed_parser = commands.add_parser("requeue-failed", help="queue failed tasks again with fresh attempts")
+    requeue_failed_parser.add_argument("--kind", action="append", dest="kinds", choices=TASK_KINDS,
+                                       help="only re-queue these task kinds (default: all)")
+
+    commands.add_parser("status", help="show task counts")
+    args = parser.parse_args()
+
+    conn = open_queue(args.queue)
+    if args.command == "enqueue-lessons":
+        enqueue_lessons(conn, args.urls, args.proxies)
+    elif args.command in ("enqueue-questions", "enqueue-titles"):
+        if not is_lesson_source(args.source):
+            print(f"Error: '{args.source}' is not a valid directory or scraper archive.")
+            sys.exit(1)
+        # Workers on other machines need paths they can resolve on the shared storage
+        source = os.path.abspath(args.source)
+        filenames = [filename for filename, _ in iter_lessons(source)]
+        if args.command == "enqueue-titles":
+            enqueue(conn, 'audit_titles', [{"source": source, "filename": filename} for filename in filenames])
+        else:
+            store = os.path.abspath(args.store or output_path(args.source, 'questions.db'))
+            enqueue(conn, 'generate_questions', [
+                {"source": source, "filename": filename, "store": store, "generator": args.generator}
+                for filename in filenames
+            ])
+    elif args.command == "worker":
+        run_worker(args.queue, tuple(args.kinds or TASK_KINDS), args.lease, args.wait, args.proxies)
+    elif args.command == "collect-lessons":
+        collect_lessons(conn, args.output_format)
+    elif args.command == "collect-questions":
+        collect_questions(conn)
+    elif args.command == "collect-titles":
+        collect_titles(conn, args.csv)
+    elif args.command == "requeue-failed":
+        requeue_failed(conn, tuple(args.kinds or TASK_KINDS))
+    else:
+        print_status(conn)
+
+if __name__ == "__main__":
+    main()